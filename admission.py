@@ -0,0 +1,132 @@
+# admission.py
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from metrics import CHAT_QUEUE_WAIT_SECONDS, CHAT_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """Запрос не допущен: очередь переполнена или время ожидания истекло."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """Занятый слот лимитера; release() можно вызывать повторно."""
+
+    def __init__(self, limiter: "AdmissionLimiter", wait_seconds: float):
+        self._limiter = limiter
+        self._started = time.monotonic()
+        self._released = False
+        self.wait_seconds = wait_seconds
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release(time.monotonic() - self._started)
+
+
+class AdmissionLimiter:
+    """
+    Ограничение числа одновременно обрабатываемых запросов к агенту.
+
+    Не больше `max_concurrent` запросов выполняются одновременно, ещё до `max_queue`
+    ждут свободного слота не дольше `queue_timeout` секунд. Остальные сразу получают
+    AdmissionRejected с оценкой Retry-After по среднему времени обработки.
+    """
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.waiting = 0
+
+        # Метрики
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.max_waiting = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.service_seconds_avg: float | None = None
+
+    def retry_after(self) -> int:
+        """Сколько секунд клиенту стоит подождать перед повтором."""
+        service = self.service_seconds_avg or self.queue_timeout
+        return max(1, math.ceil(service * (self.waiting + 1) / self.max_concurrent))
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Занимает слот, при необходимости ожидая в очереди.
+
+        Raises:
+            AdmissionRejected: очередь переполнена или ожидание дольше queue_timeout.
+        """
+        if self.active + self.waiting >= self.max_concurrent + self.max_queue:
+            self.rejected_queue_full += 1
+            CHAT_REJECTED.inc(reason="queue_full")
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            CHAT_REJECTED.inc(reason="queue_timeout")
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        finally:
+            self.waiting -= 1
+
+        wait_seconds = time.monotonic() - started
+        self.active += 1
+        self.admitted += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+        CHAT_QUEUE_WAIT_SECONDS.observe(wait_seconds)
+        return AdmissionTicket(self, wait_seconds)
+
+    def _release(self, service_seconds: float) -> None:
+        self.active -= 1
+        self._semaphore.release()
+        # Скользящее среднее времени обработки для Retry-After
+        if self.service_seconds_avg is None:
+            self.service_seconds_avg = service_seconds
+        else:
+            self.service_seconds_avg = 0.8 * self.service_seconds_avg + 0.2 * service_seconds
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[AdmissionTicket]:
+        """Занимает слот на время блока with."""
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        """Текущее состояние очереди и накопленные метрики ожидания."""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_seconds_avg": self.wait_seconds_total / self.admitted if self.admitted else 0.0,
+            "wait_seconds_max": self.wait_seconds_max,
+            "service_seconds_avg": self.service_seconds_avg,
+        }
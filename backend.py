@@ -1,10 +1,24 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+import asyncio
+import os
 import sqlite3
-from typing import List, Dict
+import time
+from contextlib import AsyncExitStack
+from typing import List, Optional
+import orjson
 from pydantic import BaseModel
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from mcp_client import TaskManagerAgent
-from llm_provider import AgentConfig, ModelProvider
+from llm_provider import AgentConfig, McpTransport, ModelProvider
+from reference_cache import REFERENCE_TABLES, ReferenceCache
+from setup import setup_database
+from db_pool import AsyncSQLiteReader, DataVersion
+from payload_cache import VersionedPayloadCache
+from task_feed import TaskFeed, format_sse
+from admission import AdmissionLimiter, AdmissionRejected
+from starlette.background import BackgroundTask
+from metrics import CONTENT_TYPE, HTTP_REQUEST_SECONDS, Gauge, render_metrics
+from chat_sessions import SESSION_COOKIE, SessionLocks, resolve_session_id, thread_id_for
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,23 +27,150 @@ app = FastAPI(title="TaskManager API")
 
 DB_PATH = "tasks.db"
 
+# Справочники приоритетов, категорий и статусов в памяти процесса
+reference_cache = ReferenceCache()
+
+# Маркер изменений базы для ETag списка задач
+data_version = DataVersion(DB_PATH)
+
+# Выделенный поток SQLite с долгоживущим подключением для чтения из async-эндпоинтов
+db_reader = AsyncSQLiteReader(DB_PATH)
+
+# Сериализованный ответ /tasks для текущего маркера изменений базы
+tasks_payload_cache = VersionedPayloadCache()
+
+# Лента изменений задач для /tasks/stream
+task_feed = TaskFeed(data_version, reference_cache, DB_PATH)
+
 # Инициализация агента при старте FastAPI
-agent_config = AgentConfig(model_provider=ModelProvider.OPENROUTER)  # или deepseek
+agent_config = AgentConfig(
+    model_provider=ModelProvider.OPENROUTER,  # или deepseek
+    # stdio — отдельный процесс mcp_server.py; embedded — инструменты в процессе backend;
+    # http/sse — общий долгоживущий сервер по адресу MCP_URL
+    mcp_transport=McpTransport(os.getenv("MCP_TRANSPORT", "stdio")),
+    # >0 — пул постоянных сессий (для stdio — процессов mcp_server.py) с выбором наименее занятой
+    mcp_pool_size=int(os.getenv("MCP_POOL_SIZE", "0")),
+    # Адрес общего MCP-сервера для MCP_TRANSPORT=http или sse
+    mcp_url=os.getenv("MCP_URL", "http://127.0.0.1:8001"),
+    # memory — ограниченная история в памяти; sqlite — история на диске (checkpoints.db)
+    checkpoint_backend=os.getenv("CHECKPOINT_BACKEND", "memory"),
+)
 agent = TaskManagerAgent(agent_config)
 
+# Сообщения одной сессии чата идут в агента по очереди
+session_locks = SessionLocks()
 
+# Ограничение одновременных запросов к агенту (LLM + MCP) с очередью ожидания
+chat_limiter = AdmissionLimiter(
+    max_concurrent=int(os.getenv("CHAT_MAX_CONCURRENT", "4")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "16")),
+    queue_timeout=float(os.getenv("CHAT_QUEUE_TIMEOUT", "30")),
+)
 
-def get_db_connection():
+
+
+class TaskOut(BaseModel):
     """
-    Создаёт и возвращает подключение к базе данных SQLite.
+    Задача в ответе /tasks.
 
-    Returns:
-        sqlite3.Connection: Подключение к базе с включённым режимом
-        возврата строк как словарей (sqlite3.Row).
+    Поля, кроме priority, category и status, совпадают с колонками таблицы tasks;
+    эти три — названия из справочников. С параметром `fields` в ответ попадают
+    только перечисленные поля.
+    """
+    id: int
+    title: str
+    description: Optional[str] = None
+    due_date: Optional[str] = None
+    priority_id: Optional[int] = None
+    category_id: Optional[int] = None
+    status_id: Optional[int] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    completed_at: Optional[str] = None
+    priority: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+
+
+TASK_FIELDS = tuple(TaskOut.model_fields)
+# Название из справочника -> колонка tasks, по которой оно вычисляется
+REFERENCE_NAME_COLUMNS = {name_key: id_column for id_column, name_key in REFERENCE_TABLES.values()}
+TASK_COLUMNS = tuple(field for field in TASK_FIELDS if field not in REFERENCE_NAME_COLUMNS)
+
+
+def parse_task_fields(fields: Optional[str]) -> tuple[str, ...]:
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    Разбирает параметр fields ("id,title,status") в кортеж полей TaskOut.
+
+    Поля возвращаются в порядке объявления в модели, так что один и тот же набор
+    в любом порядке даёт один ключ кэша. Без параметра — все поля.
+
+    Raises:
+        HTTPException: 400, если указано неизвестное поле или не выбрано ни одного поля
+            (например, "fields=" или "fields=,").
+    """
+    if fields is None:
+        return TASK_FIELDS
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(TASK_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    if not requested:
+        raise HTTPException(status_code=400, detail="Не выбрано ни одного поля")
+    return tuple(field for field in TASK_FIELDS if field in requested)
+
+
+# Состояние лимитера чата; обновляется при каждом запросе /metrics
+CHAT_ACTIVE = Gauge("chat_active_requests", "Запросы к агенту, обрабатываемые сейчас")
+CHAT_QUEUE_DEPTH = Gauge("chat_queue_depth", "Запросы к агенту, ждущие свободного слота")
+
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    """Замеряет длительность запроса для гистограммы http_request_duration_seconds."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Шаблон пути, а не сам путь: число рядов метрики не зависит от параметров
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=str(status),
+        )
+
+
+def read_tasks(conn: sqlite3.Connection, fields: tuple[str, ...]) -> list[dict]:
+    """
+    Читает задачи, выбирая из tasks только колонки, нужные для полей `fields`.
+
+    Выполняется в потоке `db_reader`, поэтому запрос берётся из кэша подготовленных
+    выражений долгоживущего подключения.
+    """
+    needed = set(fields) | {REFERENCE_NAME_COLUMNS[field] for field in fields if field in REFERENCE_NAME_COLUMNS}
+    columns = [column for column in TASK_COLUMNS if column in needed]
+    rows = conn.execute(f"SELECT {', '.join(columns)} FROM tasks ORDER BY created_at, id").fetchall()
+
+    if not any(field in REFERENCE_NAME_COLUMNS for field in fields):
+        return [dict(row) for row in rows]
+
+    # Названия приоритета, категории и статуса берём из кэша справочников
+    reference_cache.refresh(conn)
+    tasks = []
+    for row in rows:
+        task = reference_cache.decorate(dict(row))
+        tasks.append({field: task[field] for field in fields})
+    return tasks
+
+
+async def build_tasks_payload(fields: tuple[str, ...]) -> bytes:
+    """Читает задачи и сериализует их в JSON через orjson."""
+    return orjson.dumps(await db_reader.run(read_tasks, fields))
 
 
 @app.get("/")
@@ -45,45 +186,74 @@ def get_index():
 
 
 
-@app.get("/tasks", response_model=List[Dict])
-def list_tasks():
+def etag_matches(request: Request, etag: str) -> bool:
+    """Проверяет, совпадает ли ETag с одним из значений заголовка If-None-Match."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [value.strip().removeprefix("W/") for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+@app.get("/tasks", response_model=List[TaskOut])
+async def list_tasks(request: Request, fields: Optional[str] = None):
     """
     Получает список всех задач с информацией о приоритете, категории и статусе.
 
+    Ответ помечается ETag по маркеру изменений базы. Если клиент прислал тот же
+    ETag в If-None-Match и база не менялась, возвращается 304 без запроса к задачам.
+    Иначе тело ответа берётся из кэша, привязанного к тому же маркеру: повторные
+    запросы без изменений в базе не читают таблицу и не сериализуют задачи заново.
+
+    Args:
+        fields (str, optional): поля через запятую (например, "id,title,status");
+            из базы читаются только нужные для них колонки. По умолчанию — все поля TaskOut.
+
     Returns:
-        List[Dict]: Список задач с полями:
+        List[TaskOut]: Список задач с полями:
             - id, title, description, created_at (и другие из таблицы tasks)
             - priority (название приоритета)
             - category (название категории)
             - status (название статуса)
 
-        В случае ошибки возвращает {"error": <сообщение>}.
+        При неизвестном поле или пустом выборе в fields возвращает 400 с {"detail": <сообщение>}.
+        В случае другой ошибки возвращает {"error": <сообщение>}.
     """
+    selected = parse_task_fields(fields)
+
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT t.*, 
-                       p.name AS priority_name,
-                       c.name AS category_name,
-                       s.name AS status_name
-                FROM tasks t
-                LEFT JOIN priorities p ON t.priority_id = p.id
-                LEFT JOIN categories c ON t.category_id = c.id
-                LEFT JOIN statuses s ON t.status_id = s.id
-                ORDER BY t.created_at
-            """)
-            rows = cursor.fetchall()
-            tasks = []
-            for row in rows:
-                task = dict(row)
-                task['priority'] = task.pop('priority_name')
-                task['category'] = task.pop('category_name')
-                task['status'] = task.pop('status_name')
-                tasks.append(task)
-            return tasks
+        # Маркер читаем до запроса: если база изменится во время чтения,
+        # следующий запрос получит новые данные, а не 304
+        marker = data_version.current()
+        etag = f'"{marker}"' if selected == TASK_FIELDS else f'"{marker};{"+".join(selected)}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        payload = await tasks_payload_cache.get_or_build(marker, selected, lambda: build_tasks_payload(selected))
+        return Response(content=payload, media_type="application/json", headers=headers)
     except Exception as e:
-        return {"error": str(e)}
+        return JSONResponse(content={"error": str(e)})
+
+
+
+@app.get("/tasks/stream")
+async def stream_tasks():
+    """
+    Лента задач в формате Server-Sent Events.
+
+    Сначала отправляет событие `snapshot` со всеми задачами, затем события `delta`
+    со списком изменений {"op": "insert" | "update", "task": {...}} или {"op": "delete", "id": ...}
+    каждый раз, когда задачи меняются (через MCP-сервер или backend).
+
+    Returns:
+        StreamingResponse: поток text/event-stream.
+    """
+    return StreamingResponse(
+        task_feed.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 
@@ -100,11 +270,35 @@ class ChatRequest(BaseModel):
 
 
 
+def remember_session(response: Response, session_id: str, is_new: bool) -> None:
+    """Отдаёт клиенту cookie с новой сессией чата."""
+    if is_new:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax", max_age=30 * 24 * 3600)
+
+
+def overloaded_response(rejected: AdmissionRejected) -> JSONResponse:
+    """Ответ 429, когда запрос к агенту не прошёл лимитер."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Агент перегружен, повторите запрос позже", "reason": rejected.reason},
+        headers={"Retry-After": str(rejected.retry_after)},
+    )
+
+
 @app.post("/chat")
-async def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest, http_request: Request, response: Response):
     """
     Обрабатывает сообщение пользователя через LLM-агента.
 
+    История разговора ведётся отдельно для каждой сессии (заголовок X-Session-Id
+    или cookie; новая сессия выдаётся в cookie). Сообщения одной сессии
+    обрабатываются по очереди, разных сессий — параллельно.
+
+    Число одновременно обрабатываемых сообщений ограничено `chat_limiter`;
+    при переполненной очереди или долгом ожидании возвращается 429 с Retry-After.
+    Слот лимитера занимается уже под блокировкой сессии: сообщения, ждущие
+    своей очереди внутри сессии, не занимают слоты и место в очереди лимитера.
+
     Args:
         request (ChatRequest): Объект с текстовым сообщением.
 
@@ -113,20 +307,135 @@ async def chat_endpoint(request: ChatRequest):
             - текст ответа агента, если агент готов;
             - сообщение об ошибке, если агент не инициализирован.
     """
+    session_id, is_new = resolve_session_id(http_request)
+    remember_session(response, session_id, is_new)
+
     if not agent.is_ready:
         return {"response": "❌ Агент не готов."}
-    response = await agent.process_message(request.message)
-    return {"response": response}
+
+    thread_id = thread_id_for(session_id)
+    async with session_locks.hold(thread_id):
+        try:
+            async with chat_limiter.slot():
+                answer = await agent.process_message(request.message, thread_id)
+        except AdmissionRejected as rejected:
+            overloaded = overloaded_response(rejected)
+            remember_session(overloaded, session_id, is_new)
+            return overloaded
+    return {"response": answer}
+
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, http_request: Request):
+    """
+    Потоковая версия /chat в формате Server-Sent Events.
+
+    События идут по мере работы агента: `token` (фрагмент ответа модели),
+    `tool_start` и `tool_end` (вызовы MCP-инструментов), затем `done` с итоговым
+    ответом или `error`. Сессия и лимит одновременных запросов — как в /chat.
+
+    Args:
+        request (ChatRequest): Объект с текстовым сообщением.
+
+    Returns:
+        StreamingResponse: поток text/event-stream.
+    """
+    session_id, is_new = resolve_session_id(http_request)
+    thread_id = thread_id_for(session_id)
+
+    if not agent.is_ready:
+        async def not_ready():
+            yield format_sse("error", {"message": "❌ Агент не готов."})
+        return StreamingResponse(not_ready(), media_type="text/event-stream")
+
+    # Блокировку сессии и слот занимаем до начала ответа, чтобы при перегрузке вернуть 429;
+    # держит их поток ответа, освобождает finish()
+    session = AsyncExitStack()
+    await session.enter_async_context(session_locks.hold(thread_id))
+    try:
+        ticket = await chat_limiter.acquire()
+    except AdmissionRejected as rejected:
+        await session.aclose()
+        overloaded = overloaded_response(rejected)
+        remember_session(overloaded, session_id, is_new)
+        return overloaded
+    except BaseException:
+        await session.aclose()
+        raise
+
+    async def finish():
+        ticket.release()
+        await session.aclose()
+
+    async def events():
+        try:
+            async for event in agent.stream_message(request.message, thread_id):
+                yield format_sse(event.pop("type"), event)
+        finally:
+            await finish()
+
+    response = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Если поток так и не начался (клиент отключился), слот и сессию освободит фоновая задача
+        background=BackgroundTask(finish),
+    )
+    remember_session(response, session_id, is_new)
+    return response
+
+
+
+@app.get("/chat/stats")
+def chat_stats():
+    """
+    Состояние лимитера запросов к агенту.
+
+    Returns:
+        dict: активные запросы, глубина очереди, отказы и время ожидания слота.
+    """
+    return chat_limiter.stats()
+
+
+
+@app.get("/metrics")
+def metrics():
+    """
+    Метрики процесса в текстовом формате Prometheus.
+
+    Гистограммы: HTTP-запросы, обработка сообщений агентом, ожидание слота лимитера чата, вызовы модели,
+    вызовы MCP-инструментов по имени, обращения к SQLite из процесса backend
+    (/tasks, лента задач; запросы инструментов — только в режиме embedded,
+    иначе они выполняются в процессе mcp_server.py). Счётчик повторов
+    retry_on_failure, отказы лимитера чата и его текущее состояние.
+    """
+    stats = chat_limiter.stats()
+    CHAT_ACTIVE.set(stats["active"])
+    CHAT_QUEUE_DEPTH.set(stats["queue_depth"])
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
 
 
 
 @app.on_event("startup")
 async def startup_event():
     """
-    Хук FastAPI: инициализация MCP-агента при запуске приложения.
+    Хук FastAPI: миграции базы и инициализация MCP-агента при запуске приложения.
 
+    Миграции применяются до приёма запросов: /tasks и кэш справочников читают
+    таблицы (reference_version, task_changes), которых может не быть, если
+    mcp_server.py ещё ни разу не запускался. Ошибка миграции останавливает запуск.
     Если агент не удалось инициализировать, выводит сообщение об ошибке в консоль.
     """
+    await asyncio.to_thread(setup_database, DB_PATH)
+
     initialized = await agent.initialize()
     if not initialized:
         print("❌ Агент MCP не удалось инициализировать")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Хук FastAPI: останавливает процессы MCP-серверов и поток чтения SQLite."""
+    await agent.close()
+    db_reader.close()
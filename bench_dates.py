@@ -0,0 +1,182 @@
+# bench_dates.py
+"""
+Бенчмарк разбора сроков: только dateparser (как было раньше) против
+многослойного parse_due_date (быстрый разбор + LRU-кэш + dateparser).
+
+Запуск:
+    python bench_dates.py [--repeat 20]
+"""
+import argparse
+import logging
+import re
+import statistics
+import time
+from datetime import date
+
+import dateparser
+
+import date_parsing
+from date_parsing import parse_due_date, parse_fast, split_time_override
+
+logger = logging.getLogger(__name__)
+
+# Типичные значения due_date, которые присылает агент
+CORPUS = [
+    "завтра", "послезавтра", "сегодня", "tomorrow", "today", "day after tomorrow",
+    "завтра утром", "завтра вечером", "сегодня ночью", "послезавтра днём", "послезавтра днем",
+    "tomorrow morning", "tomorrow evening", "today afternoon", "tomorrow night",
+    "в понедельник", "во вторник", "в среду", "в четверг", "в пятницу", "в субботу", "в воскресенье",
+    "понедельник", "пятница", "monday", "friday", "on sunday", "в пятницу вечером",
+    "завтра в 15:00", "tomorrow at 09:30", "в пятницу в 18:00", "послезавтра 10:00",
+    "2025-09-18", "2025-12-31", "2025-09-18 10:30", "2025-09-18T18:00:00",
+    "5 сентября", "через 2 дня", "через неделю", "next week", "in 3 days", "1 января 2026",
+]
+
+
+# Прежняя реализация из mcp_server.py без изменений: каждая строка целиком уходит в dateparser
+def legacy_parse_due_date(raw_due: str | None) -> str | None:
+    """
+    Преобразует текстовую дату в ISO-формат.
+
+    Функция пытается распознать дату и время из строки.
+    Если во входной строке указано время суток ("утром", "вечером", "night" и т.п.),
+    оно подставляется автоматически. Если время явно не указано, возвращается только дата.
+
+    Args:
+        raw_due (str | None): текстовое представление даты и/или времени.
+
+    Returns:
+        str | None: ISO-строка даты/времени, например "2025-09-18" или "2025-09-18T18:00:00".
+                    Возвращает None, если строку не удалось распознать.
+    """
+    if not raw_due:
+        return None
+
+    text = raw_due.strip().lower()
+
+    # словарь для времён суток
+    time_overrides = {
+        "утром": (9, 0),
+        "днём": (13, 0),
+        "днем": (13, 0),  # без ё
+        "вечером": (18, 0),
+        "ночью": (23, 0),
+        "morning": (9, 0),
+        "afternoon": (13, 0),
+        "evening": (18, 0),
+        "night": (23, 0),
+    }
+
+    # Ищем в строке ключевые слова для времени суток, сохраняем их в переменную matched_time и чистим строку от слова, чтобы парсер мог распознать дату
+    matched_time = None
+    for word, (h, m) in time_overrides.items():
+        if word in text:
+            matched_time = (h, m)
+            text = text.replace(word, "").strip()  # убираем слово, чтобы parser понял дату
+            break
+
+    # Распознаём то, что осталось от даты (например, слова типа "завтра", "5 сентября")
+    parsed = dateparser.parse(
+        text,
+        languages=["ru", "en"],
+        settings={
+            "PREFER_DATES_FROM": "future",
+            "PREFER_DAY_OF_MONTH": "current",
+            "RETURN_AS_TIMEZONE_AWARE": False,
+        }
+    )
+
+    if not parsed:
+        logger.warning(f"Unrecognized due_date: {raw_due}")
+        return None
+
+    # Если нашли время суток, подставляем его вручную
+    if matched_time:
+        parsed = parsed.replace(hour=matched_time[0], minute=matched_time[1])
+        return parsed.isoformat()
+
+    # Проверяем, было ли указано во входе время явно
+    time_pattern = r"\b\d{1,2}[:.]\d{2}\b"
+    if re.search(time_pattern, raw_due):
+        return parsed.isoformat()
+
+    # Иначе возвращаем только дату
+    return parsed.date().isoformat()
+
+
+def _differs_only_in_seconds(expected: str | None, actual: str | None) -> bool:
+    """
+    Результаты совпадают с точностью до минут.
+
+    Прежняя реализация сохраняла секунды и микросекунды текущего момента
+    ("...T18:00:41.123456"), parse_due_date обнуляет их ("...T18:00:00") —
+    это намеренное изменение, а не расхождение разбора.
+    """
+    return (
+        expected is not None and actual is not None
+        and "T" in expected and "T" in actual
+        and expected[:16] == actual[:16]
+    )
+
+
+def _measure(func, repeat: int) -> list[float]:
+    """Задержка одного вызова func на строку корпуса, в микросекундах."""
+    timings = []
+    for _ in range(repeat):
+        for text in CORPUS:
+            start = time.perf_counter()
+            func(text)
+            timings.append((time.perf_counter() - start) * 1_000_000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк разбора сроков задач")
+    parser.add_argument("--repeat", type=int, default=20, help="сколько раз прогнать корпус")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    # Прогрев dateparser (загрузка языковых данных) не должен попадать в замер
+    legacy_parse_due_date("завтра")
+
+    # Быстрый путь должен давать тот же результат, что и dateparser
+    today = date.today()
+    fast_hits = 0
+    normalized = 0
+    for text in CORPUS:
+        stripped, _ = split_time_override(text)
+        if parse_fast(stripped, today) is None:
+            continue
+        fast_hits += 1
+        expected, actual = legacy_parse_due_date(text), parse_due_date(text)
+        if expected == actual:
+            continue
+        if _differs_only_in_seconds(expected, actual):
+            normalized += 1
+        else:
+            print(f"MISMATCH {text!r}: dateparser={expected} fast={actual}")
+    print(f"Fast path covers {fast_hits} of {len(CORPUS)} corpus phrases")
+    if normalized:
+        print(f"Seconds normalized to :00 (intended change) in {normalized} phrases")
+
+    def layered_cold(text):
+        date_parsing._parse_normalized.cache_clear()
+        parse_due_date(text)
+
+    report = {
+        "dateparser only": _measure(legacy_parse_due_date, args.repeat),
+        "layered, cold cache": _measure(layered_cold, args.repeat),
+        "layered, warm cache": _measure(parse_due_date, args.repeat),
+    }
+
+    print(f"{'mode':<22}{'mean':>12}{'p50':>12}{'p95':>12}")
+    for name, timings in report.items():
+        timings.sort()
+        p50 = timings[len(timings) // 2]
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{name:<22}{statistics.mean(timings):>9.1f} us{p50:>9.1f} us{p95:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# bench_db.py
+"""
+Бенчмарк задержки инструментов MCP-сервера: подключение на каждый вызов
+(как было раньше) против пула подключений SQLitePool.
+
+Запуск:
+    python bench_db.py [--tasks 500] [--repeat 200]
+"""
+import argparse
+import contextlib
+import io
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+
+import mcp_server
+from db_pool import SQLitePool
+from setup import setup_database
+
+
+class PerCallConnections:
+    """Прежнее поведение: новое подключение с журналом по умолчанию на каждый вызов."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    reader = _connect
+    writer = _connect
+
+    def close(self) -> None:
+        pass
+
+
+def _measure(func, repeat: int) -> list[float]:
+    """Возвращает список задержек вызова func в миллисекундах."""
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run_scenario(provider, tasks: int, repeat: int) -> dict[str, list[float]]:
+    """Прогоняет все инструменты на заданном поставщике подключений."""
+    mcp_server.pool = provider
+
+    for i in range(tasks):
+        mcp_server.add_task(title=f"Seed task {i}", description=f"seed description {i}")
+
+    # ID созданных в замере задач: edit_task правит их напрямую, без поиска по
+    # подстроке (иначе "Bench task 1" совпадает с "Bench task 10..." и записи нет)
+    bench_ids: list[int] = []
+
+    def add_bench_task(i: int) -> None:
+        bench_ids.append(mcp_server.add_task(title=f"Bench task {i}")["data"]["id"])
+
+    def edit_bench_task(i: int) -> None:
+        result = mcp_server.edit_task(task_id=bench_ids[i], description=f"edited {i}")
+        assert result["status"] == "success", result
+
+    results = {
+        "add_task": _measure(add_bench_task, repeat),
+        "list_tasks": _measure(lambda i: mcp_server.list_tasks(), repeat),
+        "search_tasks": _measure(lambda i: mcp_server.search_tasks(f"Seed task {i % tasks}"), repeat),
+        "edit_task": _measure(edit_bench_task, repeat),
+    }
+
+    with provider.reader() as conn:
+        ids = [row[0] for row in conn.execute("SELECT id FROM tasks ORDER BY id DESC LIMIT ?", (repeat,))]
+    results["delete_task"] = _measure(lambda i: mcp_server.delete_task(ids[i]), len(ids))
+
+    provider.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пула подключений SQLite")
+    parser.add_argument("--tasks", type=int, default=500, help="сколько задач создать перед замером")
+    parser.add_argument("--repeat", type=int, default=200, help="сколько вызовов каждого инструмента")
+    args = parser.parse_args()
+
+    # логирование инструментов не должно попадать в замер
+    logging.disable(logging.INFO)
+
+    scenarios = {
+        "per-call": PerCallConnections,
+        "pool": SQLitePool,
+    }
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, provider_cls in scenarios.items():
+            db_path = os.path.join(tmp, f"{name}.db")
+            with contextlib.redirect_stdout(io.StringIO()):
+                setup_database(db_path)
+            report[name] = run_scenario(provider_cls(db_path), args.tasks, args.repeat)
+
+    print(f"{'tool':<14}" + "".join(f"{name + ' mean':>16}{name + ' p95':>16}" for name in scenarios))
+    for tool in report["pool"]:
+        line = f"{tool:<14}"
+        for name in scenarios:
+            timings = sorted(report[name][tool])
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            line += f"{statistics.mean(timings):>13.3f} ms{p95:>13.3f} ms"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# chat_sessions.py
+import asyncio
+import re
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import Request
+
+SESSION_COOKIE = "chat_session"
+SESSION_HEADER = "X-Session-Id"
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def resolve_session_id(request: Request) -> tuple[str, bool]:
+    """
+    Определяет сессию чата по заголовку X-Session-Id или cookie.
+
+    Значения другого формата игнорируются. Если сессии нет, создаётся новая.
+
+    Returns:
+        tuple[str, bool]: ID сессии и признак того, что она только что создана
+        (тогда её нужно отдать клиенту в cookie).
+    """
+    for value in (request.headers.get(SESSION_HEADER), request.cookies.get(SESSION_COOKIE)):
+        if value and SESSION_ID_RE.match(value):
+            return value, False
+    return uuid.uuid4().hex, True
+
+
+def thread_id_for(session_id: str) -> str:
+    """ID потока LangGraph для сессии чата."""
+    return f"web-{session_id}"
+
+
+class SessionLocks:
+    """
+    Блокировки asyncio по потокам LangGraph.
+
+    Сообщения одной сессии обрабатываются строго по очереди, разные сессии — параллельно.
+    Блокировка удаляется, когда её никто не держит и не ждёт, поэтому словарь
+    не растёт вместе с числом сессий.
+    """
+
+    def __init__(self):
+        self._locks: dict[str, tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str) -> AsyncIterator[None]:
+        lock, users = self._locks.get(thread_id, (asyncio.Lock(), 0))
+        self._locks[thread_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[thread_id]
+            if users == 1:
+                del self._locks[thread_id]
+            else:
+                self._locks[thread_id] = (lock, users - 1)
+
+    def __len__(self) -> int:
+        return len(self._locks)
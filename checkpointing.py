@@ -0,0 +1,146 @@
+# checkpointing.py
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+class IdleThreadTracker:
+    """
+    Учёт последнего обращения к потокам LangGraph для вытеснения по LRU/TTL.
+
+    touch() отмечает поток и возвращает потоки, которые нужно удалить: самые
+    давние сверх `max_threads` и все, к которым не обращались дольше `idle_ttl` секунд.
+    """
+
+    def __init__(self, max_threads: int = 1000, idle_ttl: float = 24 * 3600):
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+
+    def touch(self, thread_id: str) -> list[str]:
+        now = time.monotonic()
+        self._last_used[thread_id] = now
+        self._last_used.move_to_end(thread_id)
+
+        evicted = []
+        while len(self._last_used) > 1:
+            oldest, last_used = next(iter(self._last_used.items()))
+            if len(self._last_used) <= self.max_threads and now - last_used <= self.idle_ttl:
+                break
+            del self._last_used[oldest]
+            evicted.append(oldest)
+        return evicted
+
+    def forget(self, thread_id: str) -> None:
+        self._last_used.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        return len(self._last_used)
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    InMemorySaver с ограничением памяти.
+
+    - хранит не больше `max_checkpoints` последних чекпоинтов на поток (последний
+      чекпоинт содержит всю историю сообщений, старые нужны только для отката);
+    - удаляет вместе с ними их pending writes и значения каналов, на которые
+      больше не ссылается ни один оставшийся чекпоинт;
+    - целиком удаляет потоки сверх `max_threads` (LRU) и простаивающие дольше `idle_ttl`.
+    """
+
+    def __init__(self, max_checkpoints: int = 10, max_threads: int = 1000, idle_ttl: float = 24 * 3600, **kwargs):
+        super().__init__(**kwargs)
+        self.max_checkpoints = max_checkpoints
+        self.threads = IdleThreadTracker(max_threads, idle_ttl)
+        self.pruned_checkpoints = 0
+        self.evicted_threads = 0
+
+    def get_tuple(self, config):
+        self._touch(config["configurable"]["thread_id"])
+        return super().get_tuple(config)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = config["configurable"]["thread_id"]
+        self._prune(thread_id, config["configurable"]["checkpoint_ns"])
+        self._touch(thread_id)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self.threads.forget(thread_id)
+
+    def _touch(self, thread_id: str) -> None:
+        for evicted in self.threads.touch(thread_id):
+            logger.info("Удалена история простаивающего потока %s", evicted)
+            super().delete_thread(evicted)
+            self.evicted_threads += 1
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints:
+            return
+
+        # ID чекпоинтов упорядочены по времени создания
+        ordered = sorted(checkpoints)
+        dropped = ordered[:-self.max_checkpoints]
+
+        kept_versions = set()
+        for checkpoint_id in ordered[-self.max_checkpoints:]:
+            kept_versions.update(self._channel_versions(checkpoints[checkpoint_id]))
+
+        for checkpoint_id in dropped:
+            for channel, version in self._channel_versions(checkpoints.pop(checkpoint_id)):
+                if (channel, version) not in kept_versions:
+                    self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        self.pruned_checkpoints += len(dropped)
+
+    def _channel_versions(self, saved: tuple) -> set[tuple[str, Any]]:
+        checkpoint = self.serde.loads_typed(saved[0])
+        return set(checkpoint["channel_versions"].items())
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "threads": len(self.storage),
+            "checkpoints": sum(len(ns) for thread in self.storage.values() for ns in thread.values()),
+            "pruned_checkpoints": self.pruned_checkpoints,
+            "evicted_threads": self.evicted_threads,
+        }
+
+
+async def create_checkpointer(
+    backend: str = "memory",
+    db_path: str = "checkpoints.db",
+    max_checkpoints: int = 10,
+    max_threads: int = 1000,
+    idle_ttl: float = 24 * 3600,
+) -> BaseCheckpointSaver:
+    """
+    Создаёт checkpointer агента.
+
+    backend="memory" — BoundedMemorySaver; backend="sqlite" — история на диске
+    (нужен пакет langgraph-checkpoint-sqlite), память процесса не растёт.
+    """
+    if backend == "memory":
+        return BoundedMemorySaver(max_checkpoints=max_checkpoints, max_threads=max_threads, idle_ttl=idle_ttl)
+    if backend == "sqlite":
+        # Импортируем только при выборе SQLite: пакет необязательный
+        from sqlite_checkpointer import BoundedSqliteSaver
+        return await BoundedSqliteSaver.open(db_path, max_checkpoints=max_checkpoints, max_threads=max_threads, idle_ttl=idle_ttl)
+    raise ValueError(f"Неизвестный тип хранилища чекпоинтов: {backend}")
+
+
+async def close_checkpointer(checkpointer: BaseCheckpointSaver | None) -> None:
+    """Закрывает подключение checkpointer'а, если оно есть."""
+    close = getattr(checkpointer, "aclose", None)
+    if close is not None:
+        await close()
@@ -0,0 +1,170 @@
+# context_budget.py
+import logging
+from typing import Any
+
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+from metrics import CONTEXT_TOKENS_SAVED, LLM_INPUT_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# ID сообщения с краткой историей (всегда первое сообщение потока)
+SUMMARY_ID = "context-summary"
+SUMMARY_HEADER = "Краткое содержание более раннего разговора:"
+
+# Сколько символов реплики пользователя и ответа оставлять в строке истории
+SUMMARY_LINE_CHARS = 200
+
+
+def _message_text(message: AnyMessage) -> str:
+    """Текст сообщения: строка или склеенные текстовые блоки (ответы MCP-адаптера)."""
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit] + "…"
+
+
+def _tokens(messages: list[AnyMessage]) -> int:
+    return count_tokens_approximately(messages)
+
+
+def _split_turns(messages: list[AnyMessage]) -> list[list[AnyMessage]]:
+    """
+    Делит историю на ходы: сообщение пользователя и всё, что агент сделал в ответ.
+
+    Ход — единица сворачивания: вызовы инструментов и их результаты
+    не разрываются, иначе модель получит tool_call без ответа.
+    """
+    turns: list[list[AnyMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+class ContextBudgetHook:
+    """
+    pre_model_hook для create_react_agent: держит историю потока в пределах бюджета токенов.
+
+    Перед каждым вызовом модели:
+    1. результаты инструментов из прошлых ходов обрезаются до `tool_output_chars`
+       символов (последний ход не трогается — модель ещё работает с его данными);
+    2. пока история больше `token_budget`, самые старые ходы сворачиваются в строку
+       краткой истории (реплика пользователя, вызванные инструменты, ответ агента);
+       краткая история хранится первым сообщением и сама не больше `summary_token_budget`.
+
+    Изменения записываются в состояние потока, так что чекпоинты тоже не растут.
+    Экономия (сколько токенов исходной истории не отправлено модели) пишется в лог
+    и в метрику context_tokens_saved.
+    """
+
+    def __init__(self, token_budget: int = 6000, tool_output_chars: int = 400, summary_token_budget: int = 1000):
+        self.token_budget = token_budget
+        self.tool_output_chars = tool_output_chars
+        self.summary_token_budget = summary_token_budget
+
+    def __call__(self, state: dict[str, Any]) -> dict[str, Any]:
+        messages: list[AnyMessage] = list(state["messages"])
+        summary = messages.pop(0) if messages and messages[0].id == SUMMARY_ID else None
+
+        turns = _split_turns(messages)
+        current = turns.pop() if turns else []
+        changed = False
+
+        # 1. Старые результаты инструментов
+        for turn in turns:
+            for index, message in enumerate(turn):
+                if isinstance(message, ToolMessage) and "original_tokens" not in message.additional_kwargs:
+                    compressed = self._compress_tool_output(message)
+                    if compressed is not None:
+                        turn[index] = compressed
+                        changed = True
+
+        # 2. Сворачивание старых ходов в краткую историю
+        def total() -> int:
+            return _tokens(([summary] if summary else []) + [m for turn in turns for m in turn] + current)
+
+        while turns and total() > self.token_budget:
+            summary = self._fold(summary, turns.pop(0))
+            changed = True
+
+        kept = ([summary] if summary else []) + [m for turn in turns for m in turn] + current
+        self._report(kept)
+
+        if not changed:
+            return {"messages": []}
+        return {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *kept]}
+
+    def _compress_tool_output(self, message: ToolMessage) -> ToolMessage | None:
+        text = _message_text(message)
+        if len(text) <= self.tool_output_chars:
+            return None
+        original_tokens = _tokens([message])
+        return message.model_copy(update={
+            "content": f"{text[:self.tool_output_chars]}… [вывод инструмента сокращён, было {len(text)} симв.]",
+            "additional_kwargs": {**message.additional_kwargs, "original_tokens": original_tokens},
+        })
+
+    def _fold(self, summary: SystemMessage | None, turn: list[AnyMessage]) -> SystemMessage:
+        """Добавляет ход в краткую историю."""
+        request = next((m for m in turn if isinstance(m, HumanMessage)), None)
+        tools = [call["name"] for m in turn for call in getattr(m, "tool_calls", None) or []]
+        answer = next((m for m in reversed(turn) if m.type == "ai" and _message_text(m).strip()), None)
+
+        line = f"- Пользователь: {_shorten(_message_text(request), SUMMARY_LINE_CHARS)}" if request else "- (без реплики)"
+        if tools:
+            line += f" | инструменты: {', '.join(dict.fromkeys(tools))}"
+        if answer is not None:
+            line += f" | ответ: {_shorten(_message_text(answer), SUMMARY_LINE_CHARS)}"
+
+        lines = summary.content.split("\n")[1:] if summary else []
+        lines.append(line)
+        folded_tokens = (summary.additional_kwargs.get("folded_tokens", 0) if summary else 0) + self._original_tokens(turn)
+
+        # Краткая история сама ограничена: самые старые строки отбрасываются
+        new_summary = self._summary_message(lines, folded_tokens)
+        while len(lines) > 1 and _tokens([new_summary]) > self.summary_token_budget:
+            lines.pop(0)
+            new_summary = self._summary_message(lines, folded_tokens)
+        return new_summary
+
+    @staticmethod
+    def _summary_message(lines: list[str], folded_tokens: int) -> SystemMessage:
+        return SystemMessage(
+            content="\n".join([SUMMARY_HEADER, *lines]),
+            id=SUMMARY_ID,
+            additional_kwargs={"folded_tokens": folded_tokens},
+        )
+
+    @staticmethod
+    def _original_tokens(messages: list[AnyMessage]) -> int:
+        """Размер сообщений до сжатия (для уже сокращённых результатов инструментов — исходный)."""
+        return sum(m.additional_kwargs.get("original_tokens") or _tokens([m]) for m in messages)
+
+    def _report(self, kept: list[AnyMessage]) -> None:
+        """Логирует и отправляет в метрики размер входа модели и экономию."""
+        sent = _tokens(kept)
+        original = 0
+        for message in kept:
+            if message.id == SUMMARY_ID:
+                original += message.additional_kwargs.get("folded_tokens", 0)
+            else:
+                original += self._original_tokens([message])
+        saved = max(original - sent, 0)
+
+        LLM_INPUT_TOKENS.observe(sent)
+        if saved:
+            CONTEXT_TOKENS_SAVED.inc(saved)
+            logger.info("Контекст модели: %s токенов вместо %s (сэкономлено %s)", sent, original, saved)
@@ -0,0 +1,153 @@
+# date_parsing.py
+import logging
+import re
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+# словарь для времён суток
+TIME_OVERRIDES = {
+    "утром": (9, 0),
+    "днём": (13, 0),
+    "днем": (13, 0),  # без ё
+    "вечером": (18, 0),
+    "ночью": (23, 0),
+    "morning": (9, 0),
+    "afternoon": (13, 0),
+    "evening": (18, 0),
+    "night": (23, 0),
+}
+
+# Смещение в днях для относительных слов
+RELATIVE_DAYS = {
+    "сегодня": 0,
+    "today": 0,
+    "завтра": 1,
+    "tomorrow": 1,
+    "послезавтра": 2,
+    "day after tomorrow": 2,
+}
+
+# Дни недели (включая винительный падеж: "в среду", "в пятницу")
+WEEKDAYS = {
+    "понедельник": 0, "вторник": 1, "среда": 2, "среду": 2, "четверг": 3,
+    "пятница": 4, "пятницу": 4, "суббота": 5, "субботу": 5, "воскресенье": 6,
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+    "friday": 4, "saturday": 5, "sunday": 6,
+}
+
+EXPLICIT_TIME_RE = re.compile(r"\b\d{1,2}[:.]\d{2}\b")
+ISO_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})(?:[t ](\d{1,2}):(\d{2})(?::(\d{2}))?)?$")
+PHRASE_RE = re.compile(
+    r"^(?:(?:в|во|on)\s+)?(?P<day>[a-zа-яё]+(?: [a-zа-яё]+)*?)"
+    r"(?:\s+(?:в\s+|at\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2}))?$"
+)
+
+DATEPARSER_SETTINGS = {
+    "PREFER_DATES_FROM": "future",
+    "PREFER_DAY_OF_MONTH": "current",
+    "RETURN_AS_TIMEZONE_AWARE": False,
+}
+
+
+def split_time_override(text: str) -> tuple[str, tuple[int, int] | None]:
+    """Находит слово времени суток ("вечером", "morning"...), убирает его из строки и возвращает время."""
+    for word, (h, m) in TIME_OVERRIDES.items():
+        if word in text:
+            return " ".join(text.replace(word, " ").split()), (h, m)
+    return text, None
+
+
+def parse_fast(text: str, today: date) -> datetime | None:
+    """
+    Быстрый разбор без dateparser: ISO 8601 и частые относительные фразы.
+
+    Поддерживает "2025-09-18", "2025-09-18 10:30", "завтра", "послезавтра", "tomorrow",
+    дни недели ("в пятницу", "monday") и время в формате ЧЧ:ММ после них ("завтра в 15:00").
+    Возвращает None, если строка не подходит ни под один шаблон.
+    """
+    iso = ISO_RE.match(text)
+    if iso:
+        year, month, day, hour, minute, second = iso.groups()
+        try:
+            return datetime(int(year), int(month), int(day),
+                            int(hour or 0), int(minute or 0), int(second or 0))
+        except ValueError:
+            return None
+
+    phrase = PHRASE_RE.match(text)
+    if not phrase:
+        return None
+
+    day_word = phrase.group("day")
+    if day_word in RELATIVE_DAYS:
+        target = today + timedelta(days=RELATIVE_DAYS[day_word])
+    elif day_word in WEEKDAYS:
+        # Как dateparser с PREFER_DATES_FROM=future: сегодняшний день недели — через неделю
+        days_ahead = (WEEKDAYS[day_word] - today.weekday()) % 7 or 7
+        target = today + timedelta(days=days_ahead)
+    else:
+        return None
+
+    hour, minute = phrase.group("hour"), phrase.group("minute")
+    if hour is None:
+        return datetime(target.year, target.month, target.day)
+    if int(hour) > 23 or int(minute) > 59:
+        return None
+    return datetime(target.year, target.month, target.day, int(hour), int(minute))
+
+
+@lru_cache(maxsize=1024)
+def _parse_normalized(text: str, today: date) -> str | None:
+    """Разбор нормализованной строки; результат кэшируется по (текст, текущая дата)."""
+    text, matched_time = split_time_override(text)
+
+    parsed = parse_fast(text, today)
+    if parsed is None:
+        # dateparser импортируется только при первом промахе быстрого разбора:
+        # его загрузка заметно увеличивает время старта MCP-сервера
+        import dateparser
+
+        # Распознаём то, что осталось от даты (например, "5 сентября", "через 2 дня")
+        parsed = dateparser.parse(text, languages=["ru", "en"], settings=DATEPARSER_SETTINGS)
+    if not parsed:
+        return None
+
+    # Если нашли время суток, подставляем его вручную
+    if matched_time:
+        return parsed.replace(hour=matched_time[0], minute=matched_time[1], second=0, microsecond=0).isoformat()
+
+    # Проверяем, было ли указано во входе время явно
+    if EXPLICIT_TIME_RE.search(text):
+        return parsed.replace(microsecond=0).isoformat()
+
+    # Иначе возвращаем только дату
+    return parsed.date().isoformat()
+
+
+def parse_due_date(raw_due: str | None) -> str | None:
+    """
+    Преобразует текстовую дату в ISO-формат.
+
+    Разбор идёт в три слоя: быстрый разбор ISO 8601 и частых фраз (`parse_fast`),
+    LRU-кэш по (нормализованная строка, текущая дата) и `dateparser` как запасной вариант.
+    Если во входной строке указано время суток ("утром", "вечером", "night" и т.п.),
+    оно подставляется автоматически. Если время явно не указано, возвращается только дата.
+
+    Args:
+        raw_due (str | None): текстовое представление даты и/или времени.
+
+    Returns:
+        str | None: ISO-строка даты/времени, например "2025-09-18" или "2025-09-18T18:00:00".
+                    Возвращает None, если строку не удалось распознать.
+    """
+    if not raw_due:
+        return None
+
+    text = " ".join(raw_due.strip().lower().split())
+    result = _parse_normalized(text, date.today())
+
+    if result is None:
+        logger.warning("Unrecognized due_date: %s", raw_due)
+    return result
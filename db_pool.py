@@ -0,0 +1,283 @@
+# db_pool.py
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from metrics import SQLITE_QUERY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = "tasks.db"
+
+T = TypeVar("T")
+
+
+class SQLitePool:
+    """
+    Пул подключений к SQLite для инструментов MCP-сервера.
+
+    - одно подключение-писатель (транзакции BEGIN IMMEDIATE под блокировкой);
+    - до `readers` подключений-читателей в режиме query_only;
+    - журнал WAL, чтобы читатели не блокировались писателем;
+    - кэш подготовленных выражений на каждом подключении (`cached_statements`).
+
+    Подключения создаются лениво при первом обращении. Время блоков reader()/writer()
+    пишется в sqlite_query_seconds текущего процесса: в /metrics backend оно попадает
+    только в режиме embedded.
+    """
+
+    def __init__(
+        self,
+        db_path: str = DB_PATH,
+        readers: int = 4,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256,
+    ):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+
+        self._max_readers = readers
+        self._readers: queue.LifoQueue = queue.LifoQueue()
+        self._readers_created = 0
+        self._readers_lock = threading.Lock()
+
+        self._writer: sqlite3.Connection | None = None
+        self._writer_lock = threading.Lock()
+
+    def _connect(self, read_only: bool) -> sqlite3.Connection:
+        """Открывает подключение и применяет PRAGMA."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            isolation_level=None,  # транзакциями управляем сами
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Выдаёт подключение только для чтения (autocommit, без долгих снапшотов)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._readers_lock:
+                can_create = self._readers_created < self._max_readers
+                if can_create:
+                    self._readers_created += 1
+            if can_create:
+                try:
+                    conn = self._connect(read_only=True)
+                except Exception:
+                    with self._readers_lock:
+                        self._readers_created -= 1
+                    raise
+            else:
+                conn = self._readers.get()
+
+        try:
+            with SQLITE_QUERY_SECONDS.time(operation="pool_read"):
+                yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Выдаёт подключение-писатель внутри транзакции BEGIN IMMEDIATE.
+
+        Транзакция фиксируется при выходе из блока и откатывается при исключении.
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(read_only=False)
+            conn = self._writer
+            with SQLITE_QUERY_SECONDS.time(operation="pool_write"):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                else:
+                    conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Закрывает все открытые подключения пула."""
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            while True:
+                try:
+                    self._readers.get_nowait().close()
+                except queue.Empty:
+                    break
+            self._readers_created = 0
+
+
+class DataVersion:
+    """
+    Маркер изменений базы на основе PRAGMA data_version.
+
+    data_version меняется, когда любое другое подключение (в том числе из другого
+    процесса, например mcp_server.py) фиксирует транзакцию. Поэтому маркер читается
+    через отдельное долгоживущее подключение, которое само ничего не пишет.
+    Префикс с моментом создания объекта не даёт маркерам совпасть после перезапуска.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._boot = format(time.time_ns(), "x")
+
+    def current(self) -> str:
+        """Возвращает текущий маркер вида "<boot>-<data_version>"."""
+        with self._lock, SQLITE_QUERY_SECONDS.time(operation="data_version"):
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return f"{self._boot}-{version}"
+
+    def close(self) -> None:
+        """Закрывает подключение маркера."""
+        with self._lock:
+            self._conn.close()
+
+
+class AsyncSQLiteReader:
+    """
+    Асинхронный доступ на чтение через выделенный поток SQLite.
+
+    Поток владеет одним долгоживущим подключением (query_only, WAL, кэш подготовленных
+    выражений) и выполняет задания из очереди по одному. Если поток завершился
+    (ошибка подключения, close()), ожидающие задания получают исключение,
+    а следующее задание запускает новый поток. Корутины ждут результат
+    как asyncio.Future и не занимают слоты threadpool FastAPI.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, busy_timeout_ms: int = 5000, cached_statements: int = 128):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+
+        self._jobs: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="sqlite-reader", daemon=True)
+                self._thread.start()
+
+    def _worker(self) -> None:
+        conn = None
+        error: BaseException | None = None
+        try:
+            conn = sqlite3.connect(
+                self.db_path,
+                timeout=self.busy_timeout_ms / 1000,
+                isolation_level=None,
+                cached_statements=self.cached_statements,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA query_only = ON")
+
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    break
+                self._execute(conn, *job)
+        except BaseException as e:
+            logger.error("SQLite reader thread failed: %s", e)
+            error = e
+        finally:
+            if conn is not None:
+                conn.close()
+            # Следующее задание запустит новый поток; оставшиеся в очереди получают ошибку
+            with self._start_lock:
+                self._thread = None
+            self._fail_pending(error or RuntimeError("SQLite reader stopped"))
+
+    @staticmethod
+    def _execute(conn: sqlite3.Connection, loop: asyncio.AbstractEventLoop, future: asyncio.Future,
+                 func: Callable, args: tuple) -> None:
+        """Выполняет одно задание; ошибка задания или закрытый цикл событий не останавливают поток."""
+        try:
+            with SQLITE_QUERY_SECONDS.time(operation=func.__name__):
+                result = func(conn, *args)
+        except BaseException as e:
+            result, error = None, e
+        else:
+            error = None
+        try:
+            loop.call_soon_threadsafe(_resolve_future, future, result, error)
+        except RuntimeError:
+            # Цикл событий уже закрыт — результат некому передать
+            pass
+
+    def _fail_pending(self, error: BaseException) -> None:
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is not None:
+                loop, future, _, _ = job
+                try:
+                    loop.call_soon_threadsafe(_resolve_future, future, None, error)
+                except RuntimeError:
+                    pass
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Выполняет func(conn, *args) в потоке SQLite и возвращает результат.
+
+        Время выполнения попадает в метрику sqlite_query_seconds с operation=func.__name__.
+        """
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put((loop, future, func, args))
+        return await future
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list[sqlite3.Row]:
+        """Выполняет запрос в потоке SQLite и возвращает все строки."""
+        def fetchall(conn: sqlite3.Connection) -> list[sqlite3.Row]:
+            return conn.execute(sql, params).fetchall()
+        return await self.run(fetchall)
+
+    def close(self) -> None:
+        """Останавливает поток и закрывает подключение."""
+        thread = self._thread
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join()
+
+
+def _resolve_future(future: asyncio.Future, result, error: BaseException | None) -> None:
+    """Передаёт результат задания в future (если её ещё не отменили)."""
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
@@ -0,0 +1,58 @@
+# embedded_tools.py
+import asyncio
+import logging
+from typing import Any
+
+import pydantic_core
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+
+logger = logging.getLogger(__name__)
+
+
+def _to_text(result: Any) -> str:
+    """Сериализует результат инструмента так же, как FastMCP для текстового ответа."""
+    if isinstance(result, str):
+        return result
+    return pydantic_core.to_json(result, fallback=str, indent=2).decode()
+
+
+def _make_tool(mcp_tool) -> BaseTool:
+    """Оборачивает инструмент FastMCP в LangChain-инструмент с той же схемой аргументов."""
+    metadata = mcp_tool.fn_metadata
+
+    def call(arguments: dict[str, Any]) -> str:
+        # Та же проверка аргументов, что и в FastMCP перед вызовом функции
+        parsed = metadata.arg_model.model_validate(metadata.pre_parse_json(arguments))
+        return _to_text(mcp_tool.fn(**parsed.model_dump_one_level()))
+
+    async def coroutine(**kwargs) -> str:
+        try:
+            # Инструменты синхронные (SQLite), поэтому выполняются вне цикла событий
+            return await asyncio.to_thread(call, kwargs)
+        except Exception as e:
+            raise ToolException(f"Error executing tool {mcp_tool.name}: {e}") from e
+
+    return StructuredTool(
+        name=mcp_tool.name,
+        description=mcp_tool.description or "",
+        args_schema=mcp_tool.parameters,
+        coroutine=coroutine,
+        handle_tool_error=True,
+    )
+
+
+def load_embedded_tools() -> list[BaseTool]:
+    """
+    Загружает инструменты mcp_server.py в текущий процесс.
+
+    Вместо запуска сервера по stdio функции инструментов вызываются напрямую:
+    без JSON-RPC, канала и второго процесса. Схемы аргументов берутся из FastMCP,
+    поэтому модель видит те же инструменты, что и в режиме stdio.
+    """
+    # Импорт здесь: в режиме stdio сервер в процесс клиента не загружается
+    import mcp_server
+
+    if not mcp_server.setup_database():
+        raise RuntimeError("Не удалось инициализировать базу данных")
+
+    return [_make_tool(tool) for tool in mcp_server.mcp._tool_manager.list_tools()]
@@ -0,0 +1,86 @@
+# importtime_report.py
+"""
+Отчёт о времени импорта модулей на основе `python -X importtime`.
+
+Запускает импорт каждого модуля в отдельном процессе (без кэша sys.modules)
+и печатает общее время и самые тяжёлые импорты по накопленному времени.
+
+Запуск:
+    python importtime_report.py [mcp_server backend ...] [--top 15]
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+DEFAULT_MODULES = ["mcp_server", "llm_provider", "mcp_client", "backend"]
+
+# Формат строки: "import time:   self [us] | cumulative | imported package"
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(.+)$")
+
+
+def measure_imports(module: str) -> list[tuple[int, int, int, str]]:
+    """
+    Импортирует модуль в отдельном интерпретаторе с -X importtime.
+
+    Returns:
+        list[tuple[int, int, int, str]]: (self мкс, cumulative мкс, глубина вложенности, имя модуля).
+
+    Raises:
+        RuntimeError: если импорт модуля завершился ошибкой.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        last_line = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else ""
+        raise RuntimeError(f"import {module} failed: {last_line}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((int(self_us), int(cumulative_us), len(indent) // 2, name.strip()))
+    return entries
+
+
+def print_report(module: str, entries: list[tuple[int, int, int, str]], top: int) -> None:
+    """Печатает итог и top-N импортов верхнего уровня модуля по накопленному времени."""
+    own = [entry for entry in entries if entry[3] == module]
+    total_us = own[-1][1] if own else sum(entry[0] for entry in entries)
+
+    print(f"\n{module}: {total_us / 1000:.1f} ms total, {len(entries)} modules imported")
+
+    heaviest = sorted(entries, key=lambda entry: entry[1], reverse=True)
+    shown = 0
+    for self_us, cumulative_us, depth, name in heaviest:
+        if name == module or depth > 1:
+            continue
+        print(f"   {cumulative_us / 1000:>9.1f} ms  {name}")
+        shown += 1
+        if shown >= top:
+            break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчёт о времени импорта модулей")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="модули для замера")
+    parser.add_argument("--top", type=int, default=15, help="сколько самых тяжёлых импортов показать")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        try:
+            print_report(module, measure_imports(module), args.top)
+        except RuntimeError as e:
+            print(f"\n{module}: {e}")
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
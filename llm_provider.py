@@ -5,19 +5,13 @@ from dataclasses import dataclass, field
 from typing import Dict, Any
 import logging
 
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langchain_deepseek import ChatDeepSeek
-
-from mcp_client_llm import AgentConfig
-
 logger = logging.getLogger(__name__)
 
 
 class LLMWrapper:
     """Единый интерфейс для вызова LLM в узлах графа."""
 
-    def __init__(self, config: AgentConfig):
+    def __init__(self, config: "AgentConfig"):
         self.model = ModelFactory.create_model(config)
 
     async def call(self, prompt: str) -> str:
@@ -35,11 +29,39 @@ class ModelProvider(Enum):
     DEEPSEEK = "deepseek"
 
 
+class McpTransport(Enum):
+    """Способы подключения агента к инструментам mcp_server.py"""
+    STDIO = "stdio"        # отдельный процесс сервера, JSON-RPC по stdio
+    EMBEDDED = "embedded"  # функции инструментов вызываются в процессе агента
+    HTTP = "http"          # общий сервер: python mcp_server.py --transport streamable-http
+    SSE = "sse"            # общий сервер: python mcp_server.py --transport sse
+
+
 @dataclass
 class AgentConfig:
     """Конфигурация агента — хранит настройки моделей и общие флаги."""
     model_provider: ModelProvider = ModelProvider.OPENROUTER
     use_memory: bool = True
+    mcp_transport: McpTransport = McpTransport.STDIO
+    # Число постоянных сессий с сервером (в режиме stdio — отдельных процессов mcp_server.py);
+    # 0 — MultiServerMCPClient без пула (сессия на каждый вызов)
+    mcp_pool_size: int = 0
+    # Адрес сервера для режимов http и sse (без пути /mcp или /sse)
+    mcp_url: str = "http://127.0.0.1:8001"
+    # Сколько секунд хранить результаты list_tasks/search_tasks на стороне клиента; 0 — без кэша
+    tool_cache_ttl: float = 30.0
+    # Хранилище истории диалогов: "memory" или "sqlite" (нужен langgraph-checkpoint-sqlite)
+    checkpoint_backend: str = "memory"
+    checkpoint_db_path: str = "checkpoints.db"
+    # Сколько последних чекпоинтов хранить на поток и сколько потоков держать
+    max_checkpoints_per_thread: int = 10
+    max_threads: int = 1000
+    # Поток без обращений дольше этого времени (секунды) удаляется
+    thread_idle_ttl: float = 24 * 3600
+    # Бюджет токенов истории на вызов модели (0 — без ограничения) и сколько символов
+    # оставлять от результатов инструментов из прошлых ходов
+    context_token_budget: int = 6000
+    tool_output_chars: int = 400
 
     model_configs: Dict[str, Dict[str, Any]] = field(default_factory=lambda: {
         "ollama": {
@@ -76,7 +98,22 @@ class AgentConfig:
             raise ValueError(f"Отсутствует переменная окружения: {api_key_env}")
 
     def get_mcp_config(self) -> Dict[str, Any]:
-        """Возвращает конфиг для MultiServerMCPClient."""
+        """Возвращает конфиг для MultiServerMCPClient (не используется в режиме embedded)."""
+        base_url = self.mcp_url.rstrip("/")
+        if self.mcp_transport == McpTransport.HTTP:
+            return {
+                "taskmanager": {
+                    "url": f"{base_url}/mcp",
+                    "transport": "streamable_http"
+                }
+            }
+        if self.mcp_transport == McpTransport.SSE:
+            return {
+                "taskmanager": {
+                    "url": f"{base_url}/sse",
+                    "transport": "sse"
+                }
+            }
         return {
             "taskmanager": {
                 "command": "python",
@@ -94,9 +131,11 @@ class ModelFactory:
         provider = config.model_provider.value
         model_config = config.model_configs[provider]
 
-        logger.info(f"Создание модели {provider}: {model_config['model_name']}")
+        logger.info("Создание модели %s: %s", provider, model_config['model_name'])
 
+        # Импортируем только пакет выбранного провайдера
         if provider == "ollama":
+            from langchain_ollama import ChatOllama
             return ChatOllama(
                 model=model_config["model_name"],
                 base_url=model_config["base_url"],
@@ -104,6 +143,7 @@ class ModelFactory:
             )
 
         elif provider in ["openrouter", "openai"]:
+            from langchain_openai import ChatOpenAI
             api_key = os.getenv(model_config.get("api_key_env", ""))
             return ChatOpenAI(
                 model=model_config["model_name"],
@@ -113,6 +153,7 @@ class ModelFactory:
             )
 
         elif provider == "deepseek":
+            from langchain_deepseek import ChatDeepSeek
             api_key = os.getenv(model_config.get("api_key_env", ""))
             return ChatDeepSeek(
                 model=model_config["model_name"],
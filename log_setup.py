@@ -0,0 +1,79 @@
+# log_setup.py
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Режимы логирования:
+#   queue — запись в QueueHandler, диск и консоль обслуживает фоновый QueueListener;
+#   sync  — обработчики вызываются в потоке запроса (как раньше).
+LOG_MODES = ("queue", "sync")
+
+_configured = False
+_listener: QueueListener | None = None
+
+
+def setup_logging(
+    name: str,
+    log_file: str,
+    level: int = logging.INFO,
+    mode: str | None = None,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+) -> None:
+    """
+    Настраивает корневой логгер процесса: консоль + файл с ротацией по размеру.
+
+    Режим берётся из аргумента `mode`, затем из переменной окружения
+    `<NAME>_LOG_MODE` (например, MCP_SERVER_LOG_MODE), затем из `LOG_MODE`;
+    по умолчанию — "queue". Обработчики, которые корневой логгер получил раньше
+    (например, от FastMCP), заменяются, как при logging.basicConfig(force=True).
+    Повторные вызовы в том же процессе ничего не меняют.
+
+    Args:
+        name (str): имя модуля для переменной окружения с режимом
+        log_file (str): путь к файлу лога
+        level (int): уровень логирования корневого логгера
+        mode (str | None): "queue" или "sync"
+        max_bytes (int): размер файла лога, после которого он ротируется
+        backup_count (int): сколько старых файлов лога хранить
+    """
+    global _configured, _listener
+
+    if _configured:
+        return
+
+    mode = (mode or os.getenv(f"{name.upper()}_LOG_MODE") or os.getenv("LOG_MODE") or "queue").lower()
+    if mode not in LOG_MODES:
+        raise ValueError(f"Неизвестный режим логирования: {mode}")
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers: list[logging.Handler] = [
+        logging.StreamHandler(),
+        RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'),
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(level)
+    _configured = True
+
+    if mode == "sync":
+        for handler in handlers:
+            root.addHandler(handler)
+        return
+
+    # Неограниченная очередь: вызов логгера никогда не ждёт диск
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root.addHandler(QueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
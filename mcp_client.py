@@ -2,30 +2,80 @@
 import asyncio
 import logging
 import os
+import time
+from uuid import UUID
 
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_core.messages import HumanMessage
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
 
+from checkpointing import close_checkpointer, create_checkpointer
+from context_budget import ContextBudgetHook
 from graph import build_graph
-from llm_provider import AgentConfig, ModelFactory, ModelProvider, LLMWrapper
+from llm_provider import AgentConfig, ModelFactory, ModelProvider, LLMWrapper, McpTransport
 from task_utils import retry_on_failure
+from tool_cache import ToolResultCache
+from log_setup import setup_logging
+from metrics import AGENT_MESSAGE_SECONDS, LLM_CALL_SECONDS, TOOL_CALL_SECONDS
 
 # ==== ЛОГГИРОВАНИЕ ====
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('mcp_client_llm.log', encoding='utf-8')
-    ]
-)
+setup_logging('mcp_client', 'mcp_client_llm.log')
 logger = logging.getLogger(__name__)
 
+# Сколько символов результата инструмента отправлять в потоковых событиях
+TOOL_OUTPUT_PREVIEW = 500
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Замеряет длительность каждого вызова модели и каждого вызова инструмента."""
+
+    # Вызывается прямо в цикле событий, без пула потоков
+    run_inline = True
+
+    def __init__(self):
+        self._llm_runs: dict[UUID, tuple[float, str]] = {}
+        self._tool_runs: dict[UUID, tuple[float, str]] = {}
+
+    def _start_llm(self, serialized: dict | None, run_id: UUID, metadata: dict | None) -> None:
+        model = (metadata or {}).get("ls_model_name") or (serialized or {}).get("name") or "unknown"
+        self._llm_runs[run_id] = (time.perf_counter(), model)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start_llm(serialized, run_id, metadata)
+
+    def _end_llm(self, run_id: UUID) -> None:
+        run = self._llm_runs.pop(run_id, None)
+        if run:
+            LLM_CALL_SECONDS.observe(time.perf_counter() - run[0], model=run[1])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._end_llm(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end_llm(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        self._tool_runs[run_id] = (time.perf_counter(), name)
+
+    def _end_tool(self, run_id: UUID, outcome: str) -> None:
+        run = self._tool_runs.pop(run_id, None)
+        if run:
+            TOOL_CALL_SECONDS.observe(time.perf_counter() - run[0], tool=run[1], outcome=outcome)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end_tool(run_id, "error")
+
 
 class TaskManagerAgent:
     """AI-агент для работы с задачами."""
@@ -35,10 +85,13 @@ class TaskManagerAgent:
         self.agent = None
         self.checkpointer = None
         self.mcp_client = None
+        self.mcp_pool = None
         self.tools = []
         self._initialized = False
+        self._metrics_callback = MetricsCallbackHandler()
+        self.tool_cache = ToolResultCache(ttl=config.tool_cache_ttl) if config.tool_cache_ttl > 0 else None
 
-        logger.info(f"Создан агент с провайдером: {config.model_provider.value}")
+        logger.info("Создан агент с провайдером: %s", config.model_provider.value)
 
     @property
     def is_ready(self) -> bool:
@@ -58,20 +111,39 @@ class TaskManagerAgent:
             # инициализация mcp клиента (с retry)
             await self._init_mcp_client()
 
+            # повторные чтения с теми же аргументами отдаются из кэша
+            if self.tool_cache is not None:
+                self.tools = self.tool_cache.wrap(self.tools)
+
             # создание модели через фабрику
             model = ModelFactory.create_model(self.config)
 
-            # создание checkpointer (memory)
+            # создание checkpointer с ограничением числа чекпоинтов и потоков
             if self.config.use_memory:
-                self.checkpointer = InMemorySaver()
-                logger.info("Память агента включена")
+                self.checkpointer = await create_checkpointer(
+                    backend=self.config.checkpoint_backend,
+                    db_path=self.config.checkpoint_db_path,
+                    max_checkpoints=self.config.max_checkpoints_per_thread,
+                    max_threads=self.config.max_threads,
+                    idle_ttl=self.config.thread_idle_ttl,
+                )
+                logger.info("Память агента включена (%s)", self.config.checkpoint_backend)
+
+            # ограничение истории, отправляемой модели
+            pre_model_hook = None
+            if self.config.context_token_budget > 0:
+                pre_model_hook = ContextBudgetHook(
+                    token_budget=self.config.context_token_budget,
+                    tool_output_chars=self.config.tool_output_chars,
+                )
 
             # создание react-агента
             self.agent = create_react_agent(
                 model=model,
                 tools=self.tools,
                 checkpointer=self.checkpointer,
-                prompt=self._get_system_prompt()
+                prompt=self._get_system_prompt(),
+                pre_model_hook=pre_model_hook,
             )
 
             # Код для варианта с графом
@@ -82,21 +154,33 @@ class TaskManagerAgent:
             return True
 
         except Exception as e:
-            logger.error(f"❌ Ошибка инициализации: {e}")
+            logger.error("❌ Ошибка инициализации: %s", e)
             return False
 
     @retry_on_failure()
     async def _init_mcp_client(self):
         """Инициализация MCP клиента и загрузка инструментов"""
-        self.mcp_client = MultiServerMCPClient(self.config.get_mcp_config())
-        self.tools = await self.mcp_client.get_tools()
+        if self.config.mcp_transport == McpTransport.EMBEDDED:
+            # Инструменты mcp_server.py вызываются напрямую, без отдельного процесса
+            from embedded_tools import load_embedded_tools
+            self.tools = await asyncio.to_thread(load_embedded_tools)
+        elif self.config.mcp_pool_size > 0:
+            # Несколько постоянных сессий (для stdio — процессов сервера), вызовы — в наименее занятую
+            from mcp_pool import McpServerPool
+            if self.mcp_pool is not None:
+                await self.mcp_pool.close()
+            self.mcp_pool = McpServerPool(self.config.get_mcp_config()["taskmanager"], size=self.config.mcp_pool_size)
+            self.tools = await self.mcp_pool.start()
+        else:
+            self.mcp_client = MultiServerMCPClient(self.config.get_mcp_config())
+            self.tools = await self.mcp_client.get_tools()
 
         if not self.tools:
             raise Exception("Нет доступных MCP инструментов")
 
-        logger.info(f"Загружено {len(self.tools)} инструментов")
+        logger.info("Загружено %s инструментов (%s)", len(self.tools), self.config.mcp_transport.value)
         for tool in self.tools:
-            logger.info(f"  • {tool.name}")
+            logger.info("  • %s", tool.name)
 
     def _get_system_prompt(self) -> str:
         """Системный промпт для агента — оставил как в оригинале."""
@@ -116,10 +200,11 @@ class TaskManagerAgent:
             return "❌ Агент не готов. Попробуйте переинициализировать."
 
         try:
-            config = {"configurable": {"thread_id": thread_id}}
+            config = {"configurable": {"thread_id": thread_id}, "callbacks": [self._metrics_callback]}
             message_input = {"messages": [HumanMessage(content=user_input)]}
 
-            response = await self.agent.ainvoke(message_input, config)
+            with AGENT_MESSAGE_SECONDS.time(mode="invoke"):
+                response = await self.agent.ainvoke(message_input, config)
             # ожидаем структуру как в оригинале
             return response["messages"][-1].content
 
@@ -137,14 +222,79 @@ class TaskManagerAgent:
             logger.error(error_msg)
             return error_msg
 
+    async def stream_message(self, user_input: str, thread_id: str = "default") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоковая обработка сообщения через astream_events react-агента.
+
+        Выдаёт события по мере выполнения:
+            - {"type": "token", "content": str} — очередной фрагмент ответа модели
+            - {"type": "tool_start", "name": str, "input": Any} — начало вызова инструмента
+            - {"type": "tool_end", "name": str, "output": str} — результат инструмента (обрезанный)
+            - {"type": "done", "response": str} — итоговый ответ
+            - {"type": "error", "message": str} — ошибка обработки
+        """
+        if not self.is_ready:
+            yield {"type": "error", "message": "❌ Агент не готов. Попробуйте переинициализировать."}
+            return
+
+        config = {"configurable": {"thread_id": thread_id}, "callbacks": [self._metrics_callback]}
+        message_input = {"messages": [HumanMessage(content=user_input)]}
+        started = time.perf_counter()
+
+        # Ответом считается текст модели после последнего вызова инструмента
+        answer_parts: list[str] = []
+        try:
+            async for event in self.agent.astream_events(message_input, config, version="v2"):
+                kind = event["event"]
+
+                if kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if isinstance(content, list):
+                        content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+                    if content:
+                        answer_parts.append(content)
+                        yield {"type": "token", "content": content}
+
+                elif kind == "on_tool_start":
+                    answer_parts.clear()
+                    yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+
+                elif kind == "on_tool_end":
+                    output = event["data"].get("output")
+                    output = getattr(output, "content", output)
+                    yield {"type": "tool_end", "name": event["name"], "output": str(output)[:TOOL_OUTPUT_PREVIEW]}
+
+            AGENT_MESSAGE_SECONDS.observe(time.perf_counter() - started, mode="stream")
+            yield {"type": "done", "response": "".join(answer_parts)}
+
+        except Exception as e:
+            error_msg = f"❌ Ошибка обработки: {e}"
+            logger.error(error_msg)
+            yield {"type": "error", "message": error_msg}
+
     def get_status(self) -> Dict[str, Any]:
         """Информация о состоянии агента (для команды status)."""
-        return {
+        status = {
             "initialized": self._initialized,
             "model_provider": self.config.model_provider.value,
+            "mcp_transport": self.config.mcp_transport.value,
             "memory_enabled": self.config.use_memory,
             "tools_count": len(self.tools)
         }
+        if self.mcp_pool is not None:
+            status["mcp_pool"] = self.mcp_pool.stats()
+        if self.tool_cache is not None:
+            status["tool_cache"] = self.tool_cache.stats()
+        if self.checkpointer is not None:
+            status["checkpoints"] = self.checkpointer.stats()
+        return status
+
+    async def close(self) -> None:
+        """Останавливает процессы MCP-серверов пула и закрывает хранилище чекпоинтов."""
+        if self.mcp_pool is not None:
+            await self.mcp_pool.close()
+            self.mcp_pool = None
+        await close_checkpointer(self.checkpointer)
 
 
 class InteractiveChat:
@@ -198,7 +348,11 @@ async def main():
 
     try:
         config = AgentConfig(
-            model_provider=ModelProvider(os.getenv("MODEL_PROVIDER", "openrouter"))
+            model_provider=ModelProvider(os.getenv("MODEL_PROVIDER", "openrouter")),
+            mcp_transport=McpTransport(os.getenv("MCP_TRANSPORT", "stdio")),
+            mcp_pool_size=int(os.getenv("MCP_POOL_SIZE", "0")),
+            mcp_url=os.getenv("MCP_URL", "http://127.0.0.1:8001"),
+            checkpoint_backend=os.getenv("CHECKPOINT_BACKEND", "memory"),
         )
 
         agent = TaskManagerAgent(config)
@@ -208,10 +362,13 @@ async def main():
             return
 
         chat = InteractiveChat(agent)
-        await chat.run()
+        try:
+            await chat.run()
+        finally:
+            await agent.close()
 
     except Exception as e:
-        logger.error(f"❌ Критическая ошибка: {e}")
+        logger.error("❌ Критическая ошибка: %s", e)
 
     logger.info("🏁 Завершение работы")
 
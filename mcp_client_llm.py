@@ -7,23 +7,15 @@ from typing import Optional, Dict, Any
 from dataclasses import dataclass, field
 
 from dotenv import load_dotenv
-from langchain_ollama import ChatOllama
-from langchain_openai import ChatOpenAI
-from langchain_deepseek import ChatDeepSeek
 from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.messages import HumanMessage
 from langgraph.prebuilt import create_react_agent
 from langgraph.checkpoint.memory import InMemorySaver
 
+from log_setup import setup_logging
+
 # ===== НАСТРОЙКА ЛОГИРОВАНИЯ =====
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('mcp_client_llm.log', encoding='utf-8')
-    ]
-)
+setup_logging('mcp_client_llm', 'mcp_client_llm.log')
 logger = logging.getLogger(__name__)
 
 
@@ -52,7 +44,7 @@ def retry_on_failure(max_retries: int = 2, delay: float = 1.0):
                 except Exception as e:
                     last_exception = e
                     if attempt < max_retries - 1:
-                        logger.warning(f"Попытка {attempt + 1} неудачна, повтор через {delay}с")
+                        logger.warning("Попытка %s неудачна, повтор через %sс", attempt + 1, delay)
                         await asyncio.sleep(delay)
             raise last_exception
 
@@ -128,9 +120,11 @@ class ModelFactory:
         provider = config.model_provider.value
         model_config = config.model_configs[provider]
 
-        logger.info(f"Создание модели {provider}: {model_config['model_name']}")
+        logger.info("Создание модели %s: %s", provider, model_config['model_name'])
 
+        # Импортируем только пакет выбранного провайдера
         if provider == "ollama":
+            from langchain_ollama import ChatOllama
             return ChatOllama(
                 model=model_config["model_name"],
                 base_url=model_config["base_url"],
@@ -138,6 +132,7 @@ class ModelFactory:
             )
 
         elif provider in ["openrouter", "openai"]:
+            from langchain_openai import ChatOpenAI
             api_key = os.getenv(model_config["api_key_env"])
             return ChatOpenAI(
                 model=model_config["model_name"],
@@ -146,6 +141,7 @@ class ModelFactory:
                 temperature=model_config["temperature"]
             )
         elif provider == "deepseek":
+            from langchain_deepseek import ChatDeepSeek
             api_key = os.getenv(model_config["api_key_env"])
             return ChatDeepSeek(
                 model=model_config["model_name"],
@@ -172,7 +168,7 @@ class TaskManagerAgent:
         self.tools = []
         self._initialized = False
 
-        logger.info(f"Создан агент с провайдером: {config.model_provider.value}")
+        logger.info("Создан агент с провайдером: %s", config.model_provider.value)
 
     @property
     def is_ready(self) -> bool:
@@ -215,7 +211,7 @@ class TaskManagerAgent:
             return True
 
         except Exception as e:
-            logger.error(f"❌ Ошибка инициализации: {e}")
+            logger.error("❌ Ошибка инициализации: %s", e)
             return False
 
     @retry_on_failure()
@@ -227,9 +223,9 @@ class TaskManagerAgent:
         if not self.tools:
             raise Exception("Нет доступных MCP инструментов")
 
-        logger.info(f"Загружено {len(self.tools)} инструментов")
+        logger.info("Загружено %s инструментов", len(self.tools))
         for tool in self.tools:
-            logger.info(f"  • {tool.name}")
+            logger.info("  • %s", tool.name)
 
     def _get_system_prompt(self) -> str:
         """Системный промпт"""
@@ -345,7 +341,7 @@ async def main():
         await chat.run()
 
     except Exception as e:
-        logger.error(f"❌ Критическая ошибка: {e}")
+        logger.error("❌ Критическая ошибка: %s", e)
 
     logger.info("🏁 Завершение работы")
 
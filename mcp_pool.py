@@ -0,0 +1,224 @@
+# mcp_pool.py
+import asyncio
+import logging
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+logger = logging.getLogger(__name__)
+
+
+class McpWorker:
+    """
+    Один процесс mcp_server.py с постоянной MCP-сессией.
+
+    Сессия открывается и закрывается в собственной фоновой задаче (контексты
+    stdio-клиента должны жить в одной задаче), остальные корутины только вызывают
+    через неё инструменты.
+    """
+
+    def __init__(self, index: int, connection: dict[str, Any]):
+        self.index = index
+        self.connection = connection
+        self.session = None
+        self.tools: dict[str, BaseTool] = {}
+        self.in_flight = 0
+        self.healthy = False
+
+        self._task: asyncio.Task | None = None
+        self._stop: asyncio.Event | None = None
+
+    async def start(self, timeout: float) -> None:
+        """Запускает процесс и ждёт готовности сессии."""
+        self._stop = asyncio.Event()
+        ready = asyncio.get_running_loop().create_future()
+        self._task = asyncio.create_task(self._run(ready))
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), timeout=timeout)
+        except BaseException:
+            await self.stop()
+            raise
+
+    async def _run(self, ready: asyncio.Future) -> None:
+        try:
+            async with create_session(self.connection) as session:
+                await session.initialize()
+                tools = await load_mcp_tools(session)
+                self.session = session
+                self.tools = {tool.name: tool for tool in tools}
+                self.healthy = True
+                ready.set_result(None)
+                await self._stop.wait()
+        except Exception as e:
+            if not ready.done():
+                ready.set_exception(e)
+            else:
+                logger.error("MCP worker %s stopped: %s", self.index, e)
+        finally:
+            self.healthy = False
+            self.session = None
+
+    async def ping(self, timeout: float) -> bool:
+        """Проверяет, что процесс жив и отвечает на запросы."""
+        if not self.healthy or self.session is None or self._task is None or self._task.done():
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception as e:
+            logger.warning("MCP worker %s ping failed: %s", self.index, e)
+            return False
+
+    async def stop(self) -> None:
+        """Закрывает сессию и завершает процесс."""
+        self.healthy = False
+        if self._stop is not None:
+            self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, Exception):
+                self._task.cancel()
+            self._task = None
+
+
+class McpServerPool:
+    """
+    Пул из `size` процессов mcp_server.py за одним набором LangChain-инструментов.
+
+    Для stdio каждый воркер — отдельный процесс; для http/sse — отдельная
+    постоянная сессия с общим сервером.
+
+    - каждый вызов инструмента уходит в наименее занятый здоровый процесс;
+    - фоновая проверка пингует процессы каждые `health_interval` секунд;
+    - вызов дольше `call_timeout` секунд прерывается, процесс перезапускается;
+    - упавший или не отвечающий процесс перезапускается.
+
+    Инструменты сервера синхронные, поэтому параллельные вызовы из разных чатов
+    в одном процессе выполняются по очереди; пул распределяет их по ядрам.
+    Повторно вызов не отправляется: инструменты вроде add_task не идемпотентны.
+    """
+
+    def __init__(
+        self,
+        connection: dict[str, Any],
+        size: int = 2,
+        health_interval: float = 10.0,
+        ping_timeout: float = 5.0,
+        start_timeout: float = 30.0,
+        call_timeout: float = 60.0,
+    ):
+        self.connection = connection
+        self.size = size
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.start_timeout = start_timeout
+        self.call_timeout = call_timeout
+
+        self.workers = [McpWorker(index, connection) for index in range(size)]
+        self.respawns = 0
+        self._health_task: asyncio.Task | None = None
+        self._respawn_lock = asyncio.Lock()
+        # Ссылки на фоновые перезапуски, чтобы задачи не собрал сборщик мусора
+        self._background_tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> list[BaseTool]:
+        """Запускает все процессы и возвращает инструменты пула."""
+        await asyncio.gather(*(worker.start(self.start_timeout) for worker in self.workers))
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info("Пул MCP-серверов запущен: %s процессов", self.size)
+        return [self._make_tool(tool) for tool in self.workers[0].tools.values()]
+
+    def _pick_worker(self) -> McpWorker:
+        healthy = [worker for worker in self.workers if worker.healthy]
+        if not healthy:
+            raise ToolException("Нет доступных MCP-серверов")
+        return min(healthy, key=lambda worker: worker.in_flight)
+
+    async def call_tool(self, name: str, arguments: dict[str, Any]) -> Any:
+        """Вызывает инструмент в наименее занятом процессе."""
+        worker = self._pick_worker()
+        worker.in_flight += 1
+        try:
+            # Колбэки (метрики, события стрима) срабатывают на внешнем инструменте пула;
+            # внутренний вызов их не наследует, иначе каждый вызов учитывался бы дважды
+            return await asyncio.wait_for(
+                worker.tools[name].ainvoke(arguments, config={"callbacks": []}),
+                timeout=self.call_timeout,
+            )
+        except asyncio.TimeoutError as e:
+            # Зависший процесс держал бы вызовы и пинги, поэтому его перезапускаем
+            logger.error("MCP worker %s timed out on %s after %ss", worker.index, name, self.call_timeout)
+            self._recycle(worker)
+            raise ToolException(f"Error executing tool {name}: timed out after {self.call_timeout}s") from e
+        except Exception as e:
+            # Ошибки самих инструментов адаптер возвращает как текст;
+            # исключение здесь означает сбой процесса или канала
+            logger.error("MCP worker %s failed on %s: %s", worker.index, name, e)
+            self._recycle(worker)
+            raise ToolException(f"Error executing tool {name}: {e}") from e
+        finally:
+            worker.in_flight -= 1
+
+    def _recycle(self, worker: McpWorker) -> None:
+        """Выводит процесс из ротации и перезапускает его в фоне."""
+        worker.healthy = False
+        task = asyncio.create_task(self._respawn(worker))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _make_tool(self, template: BaseTool) -> BaseTool:
+        """LangChain-инструмент с той же схемой, что у сервера, но с вызовом через пул."""
+        name = template.name
+
+        async def coroutine(**kwargs) -> Any:
+            return await self.call_tool(name, kwargs)
+
+        return StructuredTool(
+            name=name,
+            description=template.description,
+            args_schema=template.args_schema,
+            coroutine=coroutine,
+            handle_tool_error=True,
+        )
+
+    async def _respawn(self, worker: McpWorker) -> None:
+        async with self._respawn_lock:
+            if worker.healthy:
+                return
+            logger.warning("Перезапуск MCP worker %s", worker.index)
+            await worker.stop()
+            try:
+                await worker.start(self.start_timeout)
+                self.respawns += 1
+            except Exception as e:
+                logger.error("MCP worker %s не перезапустился: %s", worker.index, e)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for worker in self.workers:
+                # Занятый процесс отвечает на пинг только после текущего вызова
+                if worker.in_flight:
+                    continue
+                if not await worker.ping(self.ping_timeout):
+                    worker.healthy = False
+                    await self._respawn(worker)
+
+    def stats(self) -> list[dict]:
+        """Состояние процессов пула."""
+        return [
+            {"index": worker.index, "healthy": worker.healthy, "in_flight": worker.in_flight}
+            for worker in self.workers
+        ]
+
+    async def close(self) -> None:
+        """Останавливает проверку здоровья и все процессы."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
@@ -1,103 +1,196 @@
+import argparse
 import logging
+import os
 import sqlite3
 from mcp.server.fastmcp import FastMCP
+from mcp.server.transport_security import TransportSecuritySettings
+from pydantic import BaseModel
 from setup import setup_database
-import dateparser
+from db_pool import SQLitePool, DB_PATH
+from reference_cache import ReferenceCache
+from date_parsing import parse_due_date
+from log_setup import setup_logging
 import re
+import json
+import base64
 
 # Init server
 mcp = FastMCP("TaskManager")
 
 # ===== LOGGING SETTINGS =====
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('mcp_server.log', encoding='utf-8')
-    ]
-)
+setup_logging('mcp_server', 'mcp_server.log')
 logger = logging.getLogger(__name__)
 
 
 # ===== DATABASE HELPERS =====
-def get_db_connection():
-    """Создает подключение к БД с row_factory"""
-    conn = sqlite3.connect('tasks.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+# Общий пул подключений: WAL, busy_timeout, отдельные читатели и писатель
+pool = SQLitePool(DB_PATH)
 
+# Справочники приоритетов, категорий и статусов в памяти процесса
+reference_cache = ReferenceCache()
 
-def parse_due_date(raw_due: str | None) -> str | None:
-    """
-    Преобразует текстовую дату в ISO-формат.
+# Размер страницы list_tasks
+DEFAULT_LIST_LIMIT = 50
+MAX_LIST_LIMIT = 200
 
-    Функция пытается распознать дату и время из строки.
-    Если во входной строке указано время суток ("утром", "вечером", "night" и т.п.),
-    оно подставляется автоматически. Если время явно не указано, возвращается только дата.
+# Максимум задач в одном вызове add_tasks
+MAX_BULK_TASKS = 100
 
-    Args:
-        raw_due (str | None): текстовое представление даты и/или времени.
+
+def encode_cursor(created_at: str, task_id: int) -> str:
+    """Кодирует позицию (created_at, id) в непрозрачный курсор для list_tasks."""
+    raw = json.dumps([created_at, task_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Декодирует курсор list_tasks. Бросает ValueError, если курсор повреждён."""
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(task_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return created_at, task_id
+
+
+def build_fts_query(query: str) -> str:
+    """
+    Превращает пользовательскую строку в безопасный запрос FTS5.
+
+    Каждое слово берётся в кавычки (чтобы операторы FTS5 не интерпретировались)
+    и помечается как префикс: "купить молоко" -> '"купить"* "молоко"*'.
+    Возвращает пустую строку, если в запросе нет ни одного слова.
+    """
+    tokens = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def build_task_filter(
+    conn,
+    status: str | None = None,
+    category: str | None = None,
+    priority: str | None = None,
+    due_from: str | None = None,
+    due_to: str | None = None
+) -> tuple[list[str], list[object]]:
+    """
+    Собирает условия WHERE для фильтра задач по названиям справочников и диапазону сроков.
 
     Returns:
-        str | None: ISO-строка даты/времени, например "2025-09-18" или "2025-09-18T18:00:00".
-                    Возвращает None, если строку не удалось распознать.
+        tuple[list[str], list[object]]: список условий и их параметры.
+
+    Raises:
+        ValueError: неизвестное название справочника или нераспознанная дата.
     """
-    if not raw_due:
-        return None
+    conditions: list[str] = []
+    params: list[object] = []
+
+    # Фильтры по справочникам задаются названиями
+    if status is not None or category is not None or priority is not None:
+        reference_cache.refresh(conn)
+
+    for column, table, value in (
+        ("status_id", "statuses", status),
+        ("category_id", "categories", category),
+        ("priority_id", "priorities", priority),
+    ):
+        if value is not None:
+            ref_id = reference_cache.resolve_id(table, value)
+            if ref_id is None:
+                raise ValueError(f"{column[:-3].capitalize()} '{value}' not found")
+            conditions.append(f"{column} = ?")
+            params.append(ref_id)
+
+    if due_from is not None:
+        parsed_from = parse_due_date(due_from)
+        if not parsed_from:
+            raise ValueError(f"Unrecognized due_from: {due_from}")
+        conditions.append("due_date >= ?")
+        params.append(parsed_from)
+
+    if due_to is not None:
+        parsed_to = parse_due_date(due_to)
+        if not parsed_to:
+            raise ValueError(f"Unrecognized due_to: {due_to}")
+        # Дата без времени включает весь день
+        if "T" not in parsed_to:
+            parsed_to += "T23:59:59"
+        conditions.append("due_date <= ?")
+        params.append(parsed_to)
+
+    return conditions, params
+
+
+def parse_due_date_update(due_date: str | None) -> str | None:
+    """
+    Разбирает новое значение срока для UPDATE.
 
-    text = raw_due.strip().lower()
-
-    # словарь для времён суток
-    time_overrides = {
-        "утром": (9, 0),
-        "днём": (13, 0),
-        "днем": (13, 0),  # без ё
-        "вечером": (18, 0),
-        "ночью": (23, 0),
-        "morning": (9, 0),
-        "afternoon": (13, 0),
-        "evening": (18, 0),
-        "night": (23, 0),
-    }
-
-    # Ищем в строке ключевые слова для времени суток, сохраняем их в переменную matched_time и чистим строку от слова, чтобы парсер мог распознать дату
-    matched_time = None
-    for word, (h, m) in time_overrides.items():
-        if word in text:
-            matched_time = (h, m)
-            text = text.replace(word, "").strip()  # убираем слово, чтобы parser понял дату
-            break
-
-    # Распознаём то, что осталось от даты (например, слова типа "завтра", "5 сентября")
-    parsed = dateparser.parse(
-        text,
-        languages=["ru", "en"],
-        settings={
-            "PREFER_DATES_FROM": "future",
-            "PREFER_DAY_OF_MONTH": "current",
-            "RETURN_AS_TIMEZONE_AWARE": False,
-        }
-    )
+    None — срок не меняется, пустая строка — срок очищается (NULL),
+    иначе текст разбирается через `parse_due_date` в ISO-строку.
 
+    Raises:
+        ValueError: дату не удалось распознать.
+    """
+    if due_date is None or not due_date.strip():
+        return due_date
+    parsed = parse_due_date(due_date)
     if not parsed:
-        logger.warning(f"Unrecognized due_date: {raw_due}")
-        return None
+        raise ValueError(f"Unrecognized due_date: {due_date}")
+    return parsed
 
-    # Если нашли время суток, подставляем его вручную
-    if matched_time:
-        parsed = parsed.replace(hour=matched_time[0], minute=matched_time[1])
-        return parsed.isoformat()
 
-    # Проверяем, было ли указано во входе время явно
-    time_pattern = r"\b\d{1,2}[:.]\d{2}\b"
-    if re.search(time_pattern, raw_due):
-        return parsed.isoformat()
+def build_task_updates(
+    conn,
+    title: str | None = None,
+    description: str | None = None,
+    priority: str | None = None,
+    category: str | None = None,
+    status: str | None = None,
+    due_date: str | None = None
+) -> tuple[list[str], list[object]]:
+    """
+    Собирает SET-часть UPDATE для задачи; справочники задаются названиями.
 
-    # Иначе возвращаем только дату
-    return parsed.date().isoformat()
+    `due_date` передаётся уже разобранным через `parse_due_date_update`
+    (разбор может идти через dateparser, поэтому выполняется до транзакции).
 
+    Returns:
+        tuple[list[str], list[object]]: список выражений "column = ?" и их параметры.
 
+    Raises:
+        ValueError: неизвестное название приоритета, категории или статуса.
+    """
+    updates: list[str] = []
+    params: list[object] = []
+
+    if title is not None:
+        updates.append("title = ?")
+        params.append(title.strip())
+
+    if description is not None:
+        updates.append("description = ?")
+        params.append(description.strip() if description.strip() else None)
+
+    # Для priority, category, status нужно найти ID по имени
+    reference_cache.refresh(conn)
+    for column, table, value in (
+        ("priority_id", "priorities", priority),
+        ("category_id", "categories", category),
+        ("status_id", "statuses", status),
+    ):
+        if value is not None:
+            ref_id = reference_cache.resolve_id(table, value)
+            if ref_id is None:
+                raise ValueError(f"{column[:-3].capitalize()} '{value}' not found")
+            updates.append(f"{column} = ?")
+            params.append(ref_id)
+
+    if due_date is not None:
+        updates.append("due_date = ?")
+        params.append(due_date.strip() if due_date.strip() else None)
+
+    return updates, params
 
 
 @mcp.tool()
@@ -160,7 +253,7 @@ def add_task(
 
         sql = f"INSERT INTO tasks ({fields}) VALUES ({placeholders})"
 
-        with get_db_connection() as conn:
+        with pool.writer() as conn:
             cursor = conn.cursor()
             cursor.execute(sql, values)
             task_id = cursor.lastrowid
@@ -169,41 +262,189 @@ def add_task(
             row = cursor.fetchone()
             task = dict(row)
 
-            logger.info(f"Added task: {task['id']} - {task['title']}")
+            logger.info("Added task: %s - %s", task['id'], task['title'])
             return {"status": "success", "data": task}
 
     except Exception as e:
-        logger.error(f"Error adding task: {e}")
+        logger.error("Error adding task: %s", e)
         return {"status": "error", "error": str(e)}
 
 
+class TaskSpec(BaseModel):
+    """Описание одной задачи для add_tasks (те же поля, что у add_task)."""
+    title: str
+    description: str | None = None
+    due_date: str | None = None
+    priority_id: int | None = None
+    category_id: int | None = None
+    status_id: int | None = None
+    started_at: str | None = None
+    completed_at: str | None = None
+
+
 @mcp.tool()
-def list_tasks():
+def add_tasks(tasks: list[TaskSpec]) -> dict:
     """
-    Получает список всех задач из базы данных.
+    Добавляет сразу несколько задач одной транзакцией.
+
+    Используйте вместо нескольких вызовов add_task, когда нужно создать много задач.
+    Каждая задача проверяется отдельно: задачи с ошибками пропускаются,
+    остальные добавляются. Сроки `due_date` парсятся один раз на каждую уникальную строку.
 
-    Функция выполняет запрос к таблице `tasks`, сортируя задачи по дате создания.
-    Возвращает список задач в виде словарей вместе с количеством найденных записей.
+    Args:
+        tasks (list[TaskSpec]): список задач (от 1 до 100), поля как у add_task
+
+    Returns:
+        dict: результат операции с полями:
+            - "status": "success" (добавлена хотя бы одна задача) или "error"
+            - "results": список результатов по каждой задаче в исходном порядке:
+              {"index": int, "status": "success", "data": {...}} или {"index": int, "status": "error", "error": str}
+            - "added": количество добавленных задач
+            - "failed": количество задач с ошибками
+            - "message": текст ошибки, если список задач пуст или слишком велик
+    """
+    try:
+        if not tasks:
+            return {"status": "error", "message": "Tasks list cannot be empty"}
+        if len(tasks) > MAX_BULK_TASKS:
+            return {"status": "error", "message": f"Too many tasks: at most {MAX_BULK_TASKS} per call"}
+
+        specs = [spec if isinstance(spec, TaskSpec) else TaskSpec(**spec) for spec in tasks]
+
+        # Парсим каждую уникальную дату один раз
+        parsed_dates = {raw: parse_due_date(raw) for raw in {spec.due_date for spec in specs if spec.due_date}}
+
+        results: list[dict] = []
+        rows_to_insert: list[tuple[int, dict[str, object]]] = []
+        for index, spec in enumerate(specs):
+            if not spec.title or not spec.title.strip():
+                results.append({"index": index, "status": "error", "error": "Task title cannot be empty"})
+                continue
+
+            data = spec.model_dump()
+            data["title"] = spec.title.strip()
+            data["due_date"] = parsed_dates.get(spec.due_date) if spec.due_date else None
+            rows_to_insert.append((index, {k: v for k, v in data.items() if v is not None}))
+
+        with pool.writer() as conn:
+            for index, data in rows_to_insert:
+                fields = ", ".join(data.keys())
+                placeholders = ", ".join("?" for _ in data)
+                try:
+                    row = conn.execute(
+                        f"INSERT INTO tasks ({fields}) VALUES ({placeholders}) RETURNING *",
+                        list(data.values())
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    # Ошибка одной строки откатывает только её, транзакция продолжается
+                    results.append({"index": index, "status": "error", "error": str(e)})
+                    continue
+                results.append({"index": index, "status": "success", "data": dict(row)})
+
+        results.sort(key=lambda item: item["index"])
+        added = sum(1 for item in results if item["status"] == "success")
+
+        logger.info("Bulk added %s of %s tasks", added, len(specs))
+        return {
+            "status": "success" if added else "error",
+            "results": results,
+            "added": added,
+            "failed": len(results) - added
+        }
+
+    except Exception as e:
+        logger.error("Error adding tasks: %s", e)
+        return {"status": "error", "message": "Failed to add tasks"}
+
+
+@mcp.tool()
+def list_tasks(
+    limit: int = DEFAULT_LIST_LIMIT,
+    cursor: str | None = None,
+    status: str | None = None,
+    category: str | None = None,
+    priority: str | None = None,
+    due_from: str | None = None,
+    due_to: str | None = None,
+    include_total: bool = False
+):
+    """
+    Получает страницу задач из базы данных с необязательными фильтрами.
+
+    Задачи сортируются по дате создания (затем по ID) и отдаются страницами по `limit` штук.
+    Для получения следующей страницы передайте `next_cursor` из предыдущего ответа в `cursor`.
+
+    Args:
+        limit (int, optional): размер страницы (от 1 до 200, по умолчанию 50)
+        cursor (str | None, optional): непрозрачный курсор `next_cursor` из предыдущего ответа
+        status (str | None, optional): название статуса (todo, in_progress, done, blocked)
+        category (str | None, optional): название категории
+        priority (str | None, optional): название приоритета
+        due_from (str | None, optional): нижняя граница срока выполнения (включительно)
+        due_to (str | None, optional): верхняя граница срока выполнения (включительно)
+        include_total (bool, optional): посчитать общее количество задач под фильтрами
 
     Returns:
         dict: результат операции с полями:
             - "status": "success" или "error"
-            - "tasks": список задач (каждая задача — словарь), присутствует только при успешном выполнении
-            - "count": количество найденных задач, присутствует только при успешном выполнении
+            - "tasks": список задач текущей страницы (каждая задача — словарь)
+            - "count": количество задач на странице
+            - "next_cursor": курсор следующей страницы или None, если страница последняя
+            - "total": общее количество задач под фильтрами (только при include_total=True)
             - "message": текст ошибки, присутствует только при неудаче
     """
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM tasks ORDER BY created_at")
-            rows = cursor.fetchall()
-            tasks = [dict(row) for row in rows]
+        limit = max(1, min(int(limit), MAX_LIST_LIMIT))
+
+        with pool.reader() as conn:
+            try:
+                conditions, params = build_task_filter(conn, status, category, priority, due_from, due_to)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+
+            filter_conditions = list(conditions)
+            filter_params = list(params)
+
+            if cursor:
+                try:
+                    cursor_created_at, cursor_id = decode_cursor(cursor)
+                except ValueError:
+                    logger.warning("Invalid list cursor provided: %s", cursor)
+                    return {"status": "error", "message": "Invalid cursor"}
+                conditions.append("(created_at, id) > (?, ?)")
+                params.extend([cursor_created_at, cursor_id])
+
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            rows = conn.execute(
+                f"SELECT * FROM tasks {where} ORDER BY created_at, id LIMIT ?",
+                [*params, limit + 1]
+            ).fetchall()
+            tasks = [dict(row) for row in rows[:limit]]
+
+            next_cursor = None
+            if len(rows) > limit:
+                last = tasks[-1]
+                next_cursor = encode_cursor(last["created_at"], last["id"])
+
+            result = {
+                "status": "success",
+                "tasks": tasks,
+                "count": len(tasks),
+                "next_cursor": next_cursor
+            }
+
+            if include_total:
+                filter_where = f"WHERE {' AND '.join(filter_conditions)}" if filter_conditions else ""
+                result["total"] = conn.execute(
+                    f"SELECT COUNT(*) FROM tasks {filter_where}", filter_params
+                ).fetchone()[0]
 
-            logger.info(f"Retrieving all tasks: {len(tasks)} found")
-            return {"status": "success", "tasks": tasks, "count": len(tasks)}
+            logger.info("Listing tasks: %s returned, more=%s", len(tasks), next_cursor is not None)
+            return result
 
     except Exception as e:
-        logger.error(f"Error listing tasks: {e}")
+        logger.error("Error listing tasks: %s", e)
         return {"status": "error", "message": "Failed to retrieve tasks"}
 
 
@@ -213,8 +454,9 @@ def search_tasks(query: str):
     """
     Выполняет поиск задач по тексту в заголовках и описаниях.
 
-    Функция ищет совпадения в таблице `tasks`, игнорируя регистр,
-    и возвращает список задач с расширенной информацией о приоритете, категории и статусе.
+    Функция ищет совпадения через полнотекстовый индекс `tasks_fts` (каждое слово
+    запроса сопоставляется как префикс, регистр не учитывается), сортирует результаты
+    по релевантности bm25 и возвращает список задач с расширенной информацией о приоритете, категории и статусе.
 
     Args:
         query (str): строка поиска. Не может быть пустой.
@@ -232,32 +474,35 @@ def search_tasks(query: str):
             logger.warning("Empty search query provided")
             return {"status": "error", "message": "Search query cannot be empty"}
 
-        with get_db_connection() as conn:
+        with pool.reader() as conn:
             cursor = conn.cursor()
-
-            # Поиск по title и description (case-insensitive)
-            search_pattern = f"%{query.strip()}%"
-            cursor.execute("""
-                SELECT t.*, p.name as priority_name, c.name as category_name, s.name as status_name
-                FROM tasks t
-                LEFT JOIN priorities p ON t.priority_id = p.id
-                LEFT JOIN categories c ON t.category_id = c.id  
-                LEFT JOIN statuses s ON t.status_id = s.id
-                WHERE LOWER(t.title) LIKE LOWER(?) OR LOWER(t.description) LIKE LOWER(?)
-                ORDER BY t.id
-            """, (search_pattern, search_pattern))
+            reference_cache.refresh(conn)
+
+            fts_query = build_fts_query(query)
+            if fts_query:
+                # Полнотекстовый поиск по title и description с ранжированием bm25
+                cursor.execute("""
+                    SELECT t.*
+                    FROM tasks_fts
+                    JOIN tasks t ON t.id = tasks_fts.rowid
+                    WHERE tasks_fts MATCH ?
+                    ORDER BY bm25(tasks_fts), t.id
+                """, (fts_query,))
+            else:
+                # В запросе нет слов (только знаки) — ищем подстроку (case-insensitive)
+                search_pattern = f"%{query.strip()}%"
+                cursor.execute("""
+                    SELECT t.*
+                    FROM tasks t
+                    WHERE LOWER(t.title) LIKE LOWER(?) OR LOWER(t.description) LIKE LOWER(?)
+                    ORDER BY t.id
+                """, (search_pattern, search_pattern))
 
             rows = cursor.fetchall()
-            tasks = []
-            for row in rows:
-                task = dict(row)
-                # Добавляем читаемые названия
-                task['priority'] = task['priority_name']
-                task['category'] = task['category_name']
-                task['status'] = task['status_name']
-                tasks.append(task)
-
-            logger.info(f"Search query '{query}': found {len(tasks)} tasks")
+            # Добавляем читаемые названия из кэша справочников
+            tasks = [reference_cache.decorate(dict(row)) for row in rows]
+
+            logger.info("Search query '%s': found %s tasks", query, len(tasks))
             return {
                 "status": "success",
                 "tasks": tasks,
@@ -266,29 +511,70 @@ def search_tasks(query: str):
             }
 
     except Exception as e:
-        logger.error(f"Error searching tasks: {e}")
+        logger.error("Error searching tasks: %s", e)
         return {"status": "error", "message": "Failed to search tasks"}
 
 
+def _update_task(task_id: int, title: str = None, description: str = None,
+                 priority: str = None, category: str = None, status: str = None, due_date: str = None) -> dict:
+    """Обновляет поля задачи с указанным ID и возвращает результат в формате edit_task."""
+    try:
+        due_date = parse_due_date_update(due_date)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+
+    with pool.writer() as conn:
+        try:
+            updates, params = build_task_updates(conn, title, description, priority, category, status, due_date)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+
+        # Если нет изменений
+        if not updates:
+            return {"status": "error", "message": "No fields to update provided"}
+
+        # Выполняем обновление и сразу получаем обновлённую задачу
+        params.append(task_id)
+        row = conn.execute(
+            f"UPDATE tasks SET {', '.join(updates)} WHERE id = ? RETURNING *", params
+        ).fetchone()
+        if row is None:
+            logger.warning("Task with ID %s not found", task_id)
+            return {"status": "error", "message": f"Task with ID {task_id} not found"}
+
+        updated_task = reference_cache.decorate(dict(row))
+
+        logger.info("Updated task %s: '%s'", task_id, updated_task['title'])
+        return {
+            "status": "success",
+            "message": f"Task '{updated_task['title']}' updated successfully",
+            "task": updated_task
+        }
+
+
 @mcp.tool()
-def edit_task(search_query: str, title: str = None, description: str = None,
-              priority: str = None, category: str = None, status: str = None, due_date: str = None):
+def edit_task(search_query: str = None, title: str = None, description: str = None,
+              priority: str = None, category: str = None, status: str = None, due_date: str = None,
+              task_id: int = None):
     """
-    Редактирует существующую задачу, найденную по строке поиска.
+    Редактирует существующую задачу, заданную по ID или найденную по строке поиска.
 
-    Функция ищет задачи, соответствующие `search_query`.
+    Если передан `task_id`, задача редактируется напрямую, без поиска.
+    Иначе функция ищет задачи, соответствующие `search_query`.
     - Если задача не найдена — возвращает ошибку.
     - Если найдено несколько задач — возвращает список и предлагает уточнить запрос.
     - Если найдена одна задача — обновляет указанные поля и возвращает обновлённую запись.
 
     Args:
-        search_query (str): строка для поиска задачи (обязательное поле)
+        search_query (str, optional): строка для поиска задачи (обязательна, если не передан task_id)
         title (str, optional): новый заголовок задачи
         description (str, optional): новое описание задачи
         priority (str, optional): новое название приоритета
         category (str, optional): новое название категории
         status (str, optional): новое название статуса
-        due_date (str, optional): новая дата выполнения (строка)
+        due_date (str, optional): новая дата выполнения (строка, разбирается как в add_task;
+            пустая строка очищает срок)
+        task_id (int, optional): ID задачи; если указан, поиск не выполняется
 
     Returns:
         dict: результат операции с возможными полями:
@@ -299,6 +585,12 @@ def edit_task(search_query: str, title: str = None, description: str = None,
             - "count": количество найденных задач (если несколько совпадений)
     """
     try:
+        if task_id is not None:
+            if not isinstance(task_id, int) or task_id <= 0:
+                logger.warning("Invalid task ID provided: %s", task_id)
+                return {"status": "error", "message": "Invalid task ID"}
+            return _update_task(task_id, title, description, priority, category, status, due_date)
+
         if not search_query or not search_query.strip():
             return {"status": "error", "message": "Search query cannot be empty"}
 
@@ -326,91 +618,104 @@ def edit_task(search_query: str, title: str = None, description: str = None,
             }
 
         # Найдена одна задача - редактируем
-        task_to_edit = found_tasks[0]
-        task_id = task_to_edit['id']
+        return _update_task(found_tasks[0]['id'], title, description, priority, category, status, due_date)
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+    except Exception as e:
+        logger.error("Error editing task: %s", e)
+        return {"status": "error", "message": "Failed to edit task"}
 
-            updates = []
-            params = []
-
-            # Подготавливаем обновления
-            if title is not None:
-                updates.append("title = ?")
-                params.append(title.strip())
-
-            if description is not None:
-                updates.append("description = ?")
-                params.append(description.strip() if description.strip() else None)
-
-            # Для priority, category, status нужно найти ID по имени
-            if priority is not None:
-                cursor.execute("SELECT id FROM priorities WHERE LOWER(name) = LOWER(?)", (priority.strip(),))
-                priority_row = cursor.fetchone()
-                if priority_row:
-                    updates.append("priority_id = ?")
-                    params.append(priority_row[0])
-                else:
-                    return {"status": "error", "message": f"Priority '{priority}' not found"}
-
-            if category is not None:
-                cursor.execute("SELECT id FROM categories WHERE LOWER(name) = LOWER(?)", (category.strip(),))
-                category_row = cursor.fetchone()
-                if category_row:
-                    updates.append("category_id = ?")
-                    params.append(category_row[0])
-                else:
-                    return {"status": "error", "message": f"Category '{category}' not found"}
-
-            if status is not None:
-                cursor.execute("SELECT id FROM statuses WHERE LOWER(name) = LOWER(?)", (status.strip(),))
-                status_row = cursor.fetchone()
-                if status_row:
-                    updates.append("status_id = ?")
-                    params.append(status_row[0])
-                else:
-                    return {"status": "error", "message": f"Status '{status}' not found"}
-
-            if due_date is not None:
-                updates.append("due_date = ?")
-                params.append(due_date.strip() if due_date.strip() else None)
-
-            # Если нет изменений
-            if not updates:
-                return {"status": "error", "message": "No fields to update provided"}
-
-            # Выполняем обновление
-            params.append(task_id)
-            update_query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = ?"
-            cursor.execute(update_query, params)
-
-            # Получаем обновленную задачу
-            cursor.execute("""
-                SELECT t.*, p.name as priority_name, c.name as category_name, s.name as status_name
-                FROM tasks t
-                LEFT JOIN priorities p ON t.priority_id = p.id
-                LEFT JOIN categories c ON t.category_id = c.id  
-                LEFT JOIN statuses s ON t.status_id = s.id
-                WHERE t.id = ?
-            """, (task_id,))
 
-            row = cursor.fetchone()
-            updated_task = dict(row)
-            updated_task['priority'] = updated_task['priority_name']
-            updated_task['category'] = updated_task['category_name']
-            updated_task['status'] = updated_task['status_name']
 
-            logger.info(f"Updated task {task_id}: '{updated_task['title']}'")
+@mcp.tool()
+def edit_tasks(
+    filter_ids: list[int] | None = None,
+    filter_status: str | None = None,
+    filter_category: str | None = None,
+    filter_priority: str | None = None,
+    filter_due_from: str | None = None,
+    filter_due_to: str | None = None,
+    priority: str | None = None,
+    category: str | None = None,
+    status: str | None = None,
+    due_date: str | None = None
+):
+    """
+    Массово изменяет все задачи, подходящие под фильтр, одним запросом UPDATE.
+
+    Используйте вместо нескольких вызовов edit_task, когда одно и то же изменение
+    нужно применить к группе задач (например, "все задачи work сделать high").
+    Нужно указать хотя бы одно условие фильтра `filter_*` и хотя бы одно изменение.
+    Условия фильтра объединяются через AND.
+
+    Args:
+        filter_ids (list[int] | None, optional): ID задач
+        filter_status (str | None, optional): текущее название статуса
+        filter_category (str | None, optional): текущее название категории
+        filter_priority (str | None, optional): текущее название приоритета
+        filter_due_from (str | None, optional): нижняя граница срока выполнения (включительно)
+        filter_due_to (str | None, optional): верхняя граница срока выполнения (включительно)
+        priority (str | None, optional): новое название приоритета
+        category (str | None, optional): новое название категории
+        status (str | None, optional): новое название статуса
+        due_date (str | None, optional): новая дата выполнения (строка, разбирается как в add_task;
+            пустая строка очищает срок)
+
+    Returns:
+        dict: результат операции с полями:
+            - "status": "success" или "error"
+            - "updated": количество изменённых задач
+            - "ids": список ID изменённых задач
+            - "message": текстовое описание результата или ошибки
+    """
+    try:
+        # Разбор фильтра и изменений (справочники, даты) — до захвата блокировки записи,
+        # чтобы ошибки ввода и обращения к справочникам не держали writer
+        try:
+            due_date = parse_due_date_update(due_date)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+
+        with pool.reader() as conn:
+            try:
+                conditions, filter_params = build_task_filter(
+                    conn, filter_status, filter_category, filter_priority, filter_due_from, filter_due_to
+                )
+                updates, params = build_task_updates(
+                    conn, priority=priority, category=category, status=status, due_date=due_date
+                )
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
+
+        if filter_ids:
+            if any(not isinstance(task_id, int) or task_id <= 0 for task_id in filter_ids):
+                return {"status": "error", "message": "Invalid task ID in filter_ids"}
+            conditions.append(f"id IN ({', '.join('?' for _ in filter_ids)})")
+            filter_params.extend(filter_ids)
+
+        # Без фильтра изменились бы все задачи — требуем явное условие
+        if not conditions:
+            return {"status": "error", "message": "At least one filter is required"}
+        if not updates:
+            return {"status": "error", "message": "No fields to update provided"}
+
+        with pool.writer() as conn:
+            rows = conn.execute(
+                f"UPDATE tasks SET {', '.join(updates)} WHERE {' AND '.join(conditions)} RETURNING id",
+                [*params, *filter_params]
+            ).fetchall()
+            ids = sorted(row[0] for row in rows)
+
+            logger.info("Bulk updated %s tasks", len(ids))
             return {
                 "status": "success",
-                "message": f"Task '{updated_task['title']}' updated successfully",
-                "task": updated_task
+                "updated": len(ids),
+                "ids": ids,
+                "message": f"{len(ids)} tasks updated"
             }
 
     except Exception as e:
-        logger.error(f"Error editing task: {e}")
-        return {"status": "error", "message": "Failed to edit task"}
+        logger.error("Error bulk editing tasks: %s", e)
+        return {"status": "error", "message": "Failed to edit tasks"}
 
 
 
@@ -433,43 +738,90 @@ def delete_task(id: int):
     try:
         # Валидация ID
         if not isinstance(id, int) or id <= 0:
-            logger.warning(f"Invalid task ID provided: {id}")
+            logger.warning("Invalid task ID provided: %s", id)
             return {"status": "error", "message": "Invalid task ID"}
 
-        with get_db_connection() as conn:
+        with pool.writer() as conn:
             cursor = conn.cursor()
 
             # Проверяем существование задачи
             cursor.execute("SELECT COUNT(*) FROM tasks WHERE id = ?", (id,))
             if cursor.fetchone()[0] == 0:
-                logger.warning(f"Task with ID {id} not found")
+                logger.warning("Task with ID %s not found", id)
                 return {"status": "error", "message": f"Task with ID {id} not found"}
 
             # Удаляем задачу
             cursor.execute("DELETE FROM tasks WHERE id = ?", (id,))
 
-            logger.info(f"Deleted task with ID: {id}")
+            logger.info("Deleted task with ID: %s", id)
             return {"status": "success", "message": f"Task {id} deleted", "id": id}
 
     except Exception as e:
-        logger.error(f"Error deleting task: {e}")
+        logger.error("Error deleting task: %s", e)
         return {"status": "error", "message": "Failed to delete task"}
 
 
+def parse_args() -> argparse.Namespace:
+    """
+    Аргументы запуска сервера.
+
+    stdio — сервер живёт как дочерний процесс одного клиента;
+    streamable-http и sse — долгоживущий сервер, к которому по HTTP
+    подключаются несколько клиентов (например, несколько воркеров backend).
+    """
+    parser = argparse.ArgumentParser(description="MCP TaskManager server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http", "sse"],
+        default=os.getenv("MCP_SERVER_TRANSPORT", "stdio"),
+    )
+    parser.add_argument("--host", default=os.getenv("MCP_SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("MCP_SERVER_PORT", "8001")))
+    return parser.parse_args()
+
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def transport_security_for(host: str) -> TransportSecuritySettings | None:
+    """
+    Настройки защиты от DNS rebinding для адреса, на котором слушает сервер.
+
+    FastMCP выбирает их в конструкторе по host по умолчанию (127.0.0.1), поэтому
+    при запуске с --host их нужно пересчитать: для loopback разрешены только
+    локальные Host/Origin, для остальных адресов (например, 0.0.0.0) проверка
+    отключена, как сделал бы сам FastMCP, иначе внешние клиенты получают 421.
+    """
+    if host not in LOOPBACK_HOSTS:
+        return None
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=["127.0.0.1:*", "localhost:*", "[::1]:*"],
+        allowed_origins=["http://127.0.0.1:*", "http://localhost:*", "http://[::1]:*"],
+    )
+
+
 def main():
+    args = parse_args()
     try:
-        logger.info("Starting MCP TaskManager server...")
+        logger.info("Starting MCP TaskManager server (%s)...", args.transport)
 
         # Инициализируем БД
         if not setup_database():
             logger.error("Failed to initialize database")
             return
 
-        mcp.run(transport="stdio")
+        if args.transport != "stdio":
+            mcp.settings.host = args.host
+            mcp.settings.port = args.port
+            mcp.settings.transport_security = transport_security_for(args.host)
+            logger.info("Listening on http://%s:%s", args.host, args.port)
+
+        mcp.run(transport=args.transport)
     except KeyboardInterrupt:
         logger.info("Server stopped by user")
     except Exception as e:
-        logger.error(f"Failed to start MCP server: {e}")
+        logger.error("Failed to start MCP server: %s", e)
         raise
 
 
@@ -0,0 +1,219 @@
+# metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Iterator
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs: list[tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидаются метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Монотонный счётчик (в выводе — <name>_total)."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}_total{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Текущее значение (глубина очереди, число активных запросов и т.п.)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [
+            f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Гистограмма длительностей с накопительными корзинами, как в Prometheus."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики по корзинам + корзина +Inf, сумма]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Замеряет длительность блока with (в том числе завершившегося исключением)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    """Все метрики процесса в текстовом формате Prometheus."""
+    lines: list[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== МЕТРИКИ ПРИЛОЖЕНИЯ =====
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Длительность HTTP-запросов к backend (для потоковых ответов — до начала тела)",
+    ("method", "path", "status"),
+)
+AGENT_MESSAGE_SECONDS = Histogram(
+    "agent_process_message_seconds",
+    "Длительность обработки одного сообщения агентом",
+    ("mode",),
+)
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds",
+    "Длительность одного вызова языковой модели",
+    ("model",),
+)
+TOOL_CALL_SECONDS = Histogram(
+    "mcp_tool_call_seconds",
+    "Длительность одного вызова MCP-инструмента",
+    ("tool", "outcome"),
+)
+# Реестр у каждого процесса свой, /metrics backend отдаёт только его. Операции пула
+# MCP-сервера (pool_read, pool_write) видны здесь только в режиме embedded: при stdio
+# и http/sse пул работает в процессе mcp_server.py, и эти замеры туда не передаются.
+SQLITE_QUERY_SECONDS = Histogram(
+    "sqlite_query_seconds",
+    "Длительность обращений к SQLite",
+    ("operation",),
+)
+TOOL_CACHE_REQUESTS = Counter(
+    "tool_cache_requests",
+    "Обращения к кэшу читающих инструментов",
+    ("tool", "result"),
+)
+LLM_INPUT_TOKENS = Histogram(
+    "llm_input_tokens",
+    "Оценка числа токенов истории, отправляемой модели",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+CONTEXT_TOKENS_SAVED = Counter(
+    "context_tokens_saved",
+    "Токены истории, не отправленные модели благодаря сжатию контекста",
+)
+RETRIES = Counter(
+    "retry_attempts",
+    "Повторные попытки в retry_on_failure",
+    ("function",),
+)
+CHAT_REJECTED = Counter(
+    "chat_rejected_requests",
+    "Запросы к агенту, отклонённые лимитером (429)",
+    ("reason",),
+)
+CHAT_QUEUE_WAIT_SECONDS = Histogram(
+    "chat_queue_wait_seconds",
+    "Ожидание слота лимитера запросами к агенту, получившими слот",
+)
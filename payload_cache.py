@@ -0,0 +1,49 @@
+# payload_cache.py
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class VersionedPayloadCache:
+    """
+    Кэш готовых (уже сериализованных) ответов, привязанный к маркеру изменений базы.
+
+    Все записи относятся к одному маркеру (например, DataVersion.current()). Как только
+    приходит запрос с другим маркером, кэш очищается — так записи из другого процесса
+    (mcp_server.py) инвалидируют его без явных уведомлений. Одновременные промахи по
+    одному ключу собирают ответ один раз: остальные запросы ждут первый.
+    """
+
+    def __init__(self):
+        self._version: str | None = None
+        self._payloads: dict[Hashable, bytes] = {}
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_build(self, version: str, key: Hashable, build: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Возвращает ответ для (version, key), при промахе собирает его через build().
+
+        Args:
+            version (str): текущий маркер изменений базы
+            key (Hashable): вариант ответа (например, набор полей)
+            build (Callable): корутина, возвращающая сериализованный ответ
+        """
+        if version == self._version and key in self._payloads:
+            self.hits += 1
+            return self._payloads[key]
+
+        async with self._lock:
+            if version != self._version:
+                self._version = version
+                self._payloads = {}
+            elif key in self._payloads:
+                self.hits += 1
+                return self._payloads[key]
+
+            self.misses += 1
+            payload = await build()
+            # Пока собирали ответ, маркер мог смениться другим запросом
+            if version == self._version:
+                self._payloads[key] = payload
+            return payload
@@ -0,0 +1,61 @@
+# reference_cache.py
+import sqlite3
+import threading
+
+# Справочник -> колонка в tasks и ключ с названием в ответах
+REFERENCE_TABLES = {
+    "priorities": ("priority_id", "priority"),
+    "categories": ("category_id", "category"),
+    "statuses": ("status_id", "status"),
+}
+
+
+class ReferenceCache:
+    """
+    Кэш справочников (приоритеты, категории, статусы) в памяти процесса.
+
+    Справочники загружаются целиком при первом обращении. Триггеры на справочниках
+    увеличивают счётчик в таблице `reference_version`; `refresh()` сверяет его
+    одним запросом по первичному ключу и перечитывает справочники только при изменении.
+    """
+
+    def __init__(self):
+        self._version: int | None = None
+        self._ids_by_name: dict[str, dict[str, int]] = {table: {} for table in REFERENCE_TABLES}
+        self._names_by_id: dict[str, dict[int, str]] = {table: {} for table in REFERENCE_TABLES}
+        self._lock = threading.Lock()
+
+    def refresh(self, conn: sqlite3.Connection) -> None:
+        """Перечитывает справочники, если они изменились с момента прошлой загрузки."""
+        version = conn.execute("SELECT version FROM reference_version WHERE id = 1").fetchone()[0]
+        if version == self._version:
+            return
+
+        with self._lock:
+            if version == self._version:
+                return
+
+            ids_by_name = {}
+            names_by_id = {}
+            for table in REFERENCE_TABLES:
+                rows = conn.execute(f"SELECT id, name FROM {table}").fetchall()
+                ids_by_name[table] = {name.lower(): ref_id for ref_id, name in rows}
+                names_by_id[table] = {ref_id: name for ref_id, name in rows}
+
+            self._ids_by_name = ids_by_name
+            self._names_by_id = names_by_id
+            self._version = version
+
+    def resolve_id(self, table: str, name: str) -> int | None:
+        """Возвращает ID записи справочника по названию (без учёта регистра)."""
+        return self._ids_by_name[table].get(name.strip().lower())
+
+    def name(self, table: str, ref_id: int | None) -> str | None:
+        """Возвращает название записи справочника по ID."""
+        return self._names_by_id[table].get(ref_id)
+
+    def decorate(self, task: dict) -> dict:
+        """Добавляет в задачу читаемые названия priority, category и status."""
+        for table, (id_column, name_key) in REFERENCE_TABLES.items():
+            task[name_key] = self._names_by_id[table].get(task.get(id_column))
+        return task
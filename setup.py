@@ -1,103 +1,289 @@
 # setup_database.py
 import sqlite3
 
+from db_pool import DB_PATH
 
-def setup_database():
-    with sqlite3.connect('tasks.db') as conn:
-        cursor = conn.cursor()
 
-        # Включаем поддержку внешних ключей
-        cursor.execute('PRAGMA foreign_keys = ON')
+# ===== МИГРАЦИИ СХЕМЫ =====
 
-        # ===== СПРАВОЧНИКИ =====
+def create_tasks_fts(cursor: sqlite3.Cursor) -> None:
+    """
+    Создаёт FTS5-индекс `tasks_fts` по title и description и триггеры синхронизации.
 
-        # Справочник приоритетов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS priorities (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                sort_order INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    Индекс хранит только токены (external content = tasks). Если индекс создаётся
+    для уже заполненной таблицы, он перестраивается по существующим задачам.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+    fts_exists = cursor.fetchone() is not None
 
-        # Справочник категорий
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                description TEXT,
-                color TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title,
+            description,
+            content='tasks',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
 
-        # Справочник статусов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS statuses (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                is_completed BOOLEAN DEFAULT FALSE,
-                sort_order INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts (tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts (rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    ''')
+
+    if not fts_exists:
+        cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+def migration_base_schema(cursor: sqlite3.Cursor) -> None:
+    """Справочники, таблица задач и базовые данные справочников."""
+    # ===== СПРАВОЧНИКИ =====
+
+    # Справочник приоритетов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS priorities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            sort_order INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Справочник категорий
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            description TEXT,
+            color TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Справочник статусов
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS statuses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            is_completed BOOLEAN DEFAULT FALSE,
+            sort_order INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # ===== ОСНОВНАЯ ТАБЛИЦА ЗАДАЧ =====
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            description TEXT,
+            due_date TIMESTAMP,
+            priority_id INTEGER DEFAULT 2 REFERENCES priorities(id),
+            category_id INTEGER DEFAULT 1 REFERENCES categories(id),
+            status_id INTEGER DEFAULT 1 REFERENCES statuses(id),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (priority_id) REFERENCES priorities(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (status_id) REFERENCES statuses(id)
+        )
+    ''')
+
+    # ===== ЗАПОЛНЯЕМ СПРАВОЧНИКИ БАЗОВЫМИ ДАННЫМИ =====
+
+    # Приоритеты (sort_order для сортировки по важности)
+    priorities_data = [
+        ('low', 1),
+        ('normal', 2),
+        ('high', 3)
+    ]
+    cursor.executemany('''
+        INSERT OR IGNORE INTO priorities (name, sort_order) VALUES (?, ?)
+    ''', priorities_data)
+
+    # Категории
+    categories_data = [
+        ('general', 'Общие задачи', '#6B7280'),
+        ('work', 'Рабочие задачи', '#3B82F6'),
+        ('personal', 'Личные дела', '#10B981'),
+        ('study', 'Обучение', '#F59E0B')
+    ]
+    cursor.executemany('''
+        INSERT OR IGNORE INTO categories (name, description, color) VALUES (?, ?, ?)
+    ''', categories_data)
+
+    # Статусы
+    statuses_data = [
+        ('todo', False, 1),
+        ('in_progress', False, 2),
+        ('done', True, 3),
+        ('blocked', False, 4)
+    ]
+    cursor.executemany('''
+        INSERT OR IGNORE INTO statuses (name, is_completed, sort_order) VALUES (?, ?, ?)
+    ''', statuses_data)
+
+
+def migration_tasks_indexes(cursor: sqlite3.Cursor) -> None:
+    """
+    Индексы под сортировку и фильтры задач.
+
+    Составные индексы начинаются со status_id, поэтому отдельный индекс
+    по status_id не нужен.
+    """
+    # Сортировка и keyset-пагинация list_tasks
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at, id)')
+    # Поиск по сроку выполнения
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks (due_date)')
+    # Фильтр по статусу + страница по дате создания
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_created ON tasks (status_id, created_at, id)')
+    # Фильтр по статусу + срок выполнения
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status_due ON tasks (status_id, due_date)')
+
+
+def migration_reference_version(cursor: sqlite3.Cursor) -> None:
+    """Счётчик изменений справочников для инвалидации ReferenceCache."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reference_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('INSERT OR IGNORE INTO reference_version (id, version) VALUES (1, 1)')
+
+    for table in ('priorities', 'categories', 'statuses'):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table} BEGIN
+                    UPDATE reference_version SET version = version + 1 WHERE id = 1;
+                END
+            ''')
+
+
+def migration_task_changes(cursor: sqlite3.Cursor) -> None:
+    """
+    Журнал изменений задач для ленты /tasks/stream.
+
+    Триггеры записывают (task_id, op) на каждую вставку, изменение и удаление;
+    журнал обрезается до последних 10 000 записей.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS task_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            task_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('insert', 'update', 'delete'))
+        )
+    ''')
+
+    for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS tasks_changes_{event.lower()} AFTER {event} ON tasks BEGIN
+                INSERT INTO task_changes (task_id, op) VALUES ({row}.id, '{event.lower()}');
+            END
         ''')
 
-        # ===== ОСНОВНАЯ ТАБЛИЦА ЗАДАЧ =====
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                description TEXT,
-                due_date TIMESTAMP,
-                priority_id INTEGER DEFAULT 2 REFERENCES priorities(id),
-                category_id INTEGER DEFAULT 1 REFERENCES categories(id),
-                status_id INTEGER DEFAULT 1 REFERENCES statuses(id),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                started_at TIMESTAMP,
-                completed_at TIMESTAMP,
-                FOREIGN KEY (priority_id) REFERENCES priorities(id),
-                FOREIGN KEY (category_id) REFERENCES categories(id),
-                FOREIGN KEY (status_id) REFERENCES statuses(id)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS task_changes_prune AFTER INSERT ON task_changes
+        WHEN new.seq % 1000 = 0 BEGIN
+            DELETE FROM task_changes WHERE seq <= new.seq - 10000;
+        END
+    ''')
+
+
+# Упорядоченный список миграций: (версия, описание, функция).
+# Новые миграции добавляются только в конец, уже выпущенные не меняются.
+MIGRATIONS = [
+    (1, "base schema and reference data", migration_base_schema),
+    (2, "tasks full-text index", create_tasks_fts),
+    (3, "tasks indexes", migration_tasks_indexes),
+    (4, "reference tables version counter", migration_reference_version),
+    (5, "task change log", migration_task_changes),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Возвращает последнюю применённую версию схемы (0 для пустой базы)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn: sqlite3.Connection) -> list[int]:
+    """
+    Применяет ещё не применённые миграции, каждую в отдельной транзакции.
+
+    Returns:
+        list[int]: версии миграций, применённые при этом вызове.
+    """
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Другой процесс мог применить миграцию, пока мы ждали блокировку
+            already_applied = conn.execute(
+                "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+            ).fetchone()
+            if already_applied:
+                conn.execute("ROLLBACK")
+                continue
+            migrate(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
             )
-        ''')
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+        applied.append(version)
+
+    if applied:
+        conn.execute("PRAGMA optimize")
+
+    return applied
+
+
+def setup_database(db_path: str = DB_PATH):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        cursor = conn.cursor()
+
+        # Включаем поддержку внешних ключей
+        cursor.execute('PRAGMA foreign_keys = ON')
+
+        applied = apply_migrations(conn)
+        if not applied:
+            return True
 
-        # ===== ЗАПОЛНЯЕМ СПРАВОЧНИКИ БАЗОВЫМИ ДАННЫМИ =====
-
-        # Приоритеты (sort_order для сортировки по важности)
-        priorities_data = [
-            ('low', 1),
-            ('normal', 2),
-            ('high', 3)
-        ]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO priorities (name, sort_order) VALUES (?, ?)
-        ''', priorities_data)
-
-        # Категории
-        categories_data = [
-            ('general', 'Общие задачи', '#6B7280'),
-            ('work', 'Рабочие задачи', '#3B82F6'),
-            ('personal', 'Личные дела', '#10B981'),
-            ('study', 'Обучение', '#F59E0B')
-        ]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO categories (name, description, color) VALUES (?, ?, ?)
-        ''', categories_data)
-
-        # Статусы
-        statuses_data = [
-            ('todo', False, 1),
-            ('in_progress', False, 2),
-            ('done', True, 3),
-            ('blocked', False, 4)
-        ]
-        cursor.executemany('''
-            INSERT OR IGNORE INTO statuses (name, is_completed, sort_order) VALUES (?, ?, ?)
-        ''', statuses_data)
-
-        conn.commit()
-        print("Database with reference tables created successfully!")
+        print(f"Database schema migrated to version {applied[-1]} (applied: {applied})")
 
         # Показываем статистику
         cursor.execute("SELECT COUNT(*) FROM priorities")
@@ -113,11 +299,13 @@ def setup_database():
         print(f"   • Статусы: {statuses_count}")
 
         return True
+    finally:
+        conn.close()
 
 
-def show_reference_data():
+def show_reference_data(db_path: str = DB_PATH):
     """Показывает данные из справочников"""
-    with sqlite3.connect('tasks.db') as conn:
+    with sqlite3.connect(db_path) as conn:
         conn.row_factory = sqlite3.Row
         cursor = conn.cursor()
 
@@ -0,0 +1,77 @@
+# sqlite_checkpointer.py
+import logging
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from checkpointing import IdleThreadTracker
+
+logger = logging.getLogger(__name__)
+
+# ID последних чекпоинтов потока, которые нужно сохранить
+KEEP_LATEST_SQL = """
+    SELECT checkpoint_id FROM checkpoints
+    WHERE thread_id = ? AND checkpoint_ns = ?
+    ORDER BY checkpoint_id DESC
+    LIMIT ?
+"""
+
+
+class BoundedSqliteSaver(AsyncSqliteSaver):
+    """
+    AsyncSqliteSaver с тем же ограничением, что и BoundedMemorySaver.
+
+    После каждой записи в базе остаются только `max_checkpoints` последних
+    чекпоинтов потока (и их writes). Потоки сверх `max_threads` и простаивающие
+    дольше `idle_ttl` (среди использованных в этом процессе) удаляются.
+    """
+
+    def __init__(self, conn: aiosqlite.Connection, max_checkpoints: int = 10, max_threads: int = 1000,
+                 idle_ttl: float = 24 * 3600, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.max_checkpoints = max_checkpoints
+        self.threads = IdleThreadTracker(max_threads, idle_ttl)
+        self.evicted_threads = 0
+
+    @classmethod
+    async def open(cls, db_path: str, **kwargs) -> "BoundedSqliteSaver":
+        """Открывает базу чекпоинтов и создаёт таблицы."""
+        saver = cls(await aiosqlite.connect(db_path), **kwargs)
+        await saver.setup()
+        return saver
+
+    async def aget_tuple(self, config):
+        await self._touch(config["configurable"]["thread_id"])
+        return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        await self._prune(str(config["configurable"]["thread_id"]), config["configurable"]["checkpoint_ns"])
+        return result
+
+    async def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_checkpoints)
+        async with self.lock:
+            for table in ("writes", "checkpoints"):
+                await self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                    f"AND checkpoint_id NOT IN ({KEEP_LATEST_SQL})",
+                    params,
+                )
+            await self.conn.commit()
+
+    async def _touch(self, thread_id: str) -> None:
+        for evicted in self.threads.touch(thread_id):
+            logger.info("Удалена история простаивающего потока %s", evicted)
+            await self.adelete_thread(evicted)
+            self.evicted_threads += 1
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "tracked_threads": len(self.threads),
+            "evicted_threads": self.evicted_threads,
+        }
+
+    async def aclose(self) -> None:
+        await self.conn.close()
@@ -0,0 +1,187 @@
+# task_feed.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from typing import AsyncIterator
+
+from db_pool import DB_PATH, DataVersion
+from metrics import SQLITE_QUERY_SECONDS
+from reference_cache import ReferenceCache
+
+logger = logging.getLogger(__name__)
+
+
+class TaskFeed:
+    """
+    Лента изменений задач для Server-Sent Events.
+
+    Один фоновый цикл на процесс сверяет маркер изменений базы (PRAGMA data_version)
+    и, только если база изменилась, читает новые записи журнала `task_changes`.
+    Изменения сворачиваются по задаче в события insert/update/delete и рассылаются
+    всем подписчикам. Нагрузка зависит от частоты изменений, а не от числа вкладок.
+    """
+
+    def __init__(
+        self,
+        data_version: DataVersion,
+        reference_cache: ReferenceCache,
+        db_path: str = DB_PATH,
+        poll_interval: float = 0.5,
+        keepalive_interval: float = 15.0,
+        subscriber_queue_size: int = 100,
+    ):
+        self.data_version = data_version
+        self.reference_cache = reference_cache
+        self.poll_interval = poll_interval
+        self.keepalive_interval = keepalive_interval
+        self.subscriber_queue_size = subscriber_queue_size
+
+        self._conn = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn_lock = threading.Lock()
+        self._subscribers: set[asyncio.Queue] = set()
+        self._last_seq: int | None = None
+        self._task: asyncio.Task | None = None
+        self._ready: asyncio.Event | None = None
+        self._start_error: Exception | None = None
+
+    # ===== ЧТЕНИЕ БАЗЫ (выполняется в отдельном потоке) =====
+
+    def _max_seq(self) -> int:
+        with self._conn_lock, SQLITE_QUERY_SECONDS.time(operation="feed_max_seq"):
+            return self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM task_changes").fetchone()[0]
+
+    def _read_snapshot(self) -> dict:
+        """Все задачи и номер последнего изменения, прочитанные в одной транзакции."""
+        with self._conn_lock, SQLITE_QUERY_SECONDS.time(operation="feed_snapshot"):
+            self._conn.execute("BEGIN")
+            try:
+                seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM task_changes").fetchone()[0]
+                self.reference_cache.refresh(self._conn)
+                rows = self._conn.execute("SELECT * FROM tasks ORDER BY created_at, id").fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+        return {"seq": seq, "tasks": [self.reference_cache.decorate(dict(row)) for row in rows]}
+
+    def _read_changes(self) -> list[dict]:
+        """Изменения после последнего разосланного, свёрнутые по задаче."""
+        with self._conn_lock, SQLITE_QUERY_SECONDS.time(operation="feed_changes"):
+            self._conn.execute("BEGIN")
+            try:
+                rows = self._conn.execute(
+                    "SELECT seq, task_id, op FROM task_changes WHERE seq > ? ORDER BY seq",
+                    (self._last_seq,)
+                ).fetchall()
+                if not rows:
+                    return []
+                self._last_seq = rows[-1]["seq"]
+
+                # Первая и последняя операция по каждой задаче
+                ops: dict[int, tuple[str, str]] = {}
+                for row in rows:
+                    first = ops[row["task_id"]][0] if row["task_id"] in ops else row["op"]
+                    ops[row["task_id"]] = (first, row["op"])
+
+                alive_ids = [task_id for task_id, (_, last) in ops.items() if last != "delete"]
+                tasks = {}
+                if alive_ids:
+                    self.reference_cache.refresh(self._conn)
+                    placeholders = ", ".join("?" for _ in alive_ids)
+                    for row in self._conn.execute(f"SELECT * FROM tasks WHERE id IN ({placeholders})", alive_ids):
+                        tasks[row["id"]] = self.reference_cache.decorate(dict(row))
+            finally:
+                self._conn.execute("COMMIT")
+
+        changes = []
+        for task_id, (first, last) in ops.items():
+            if last == "delete" or task_id not in tasks:
+                # Задача, созданная и удалённая между опросами, клиенту неизвестна
+                if first != "insert":
+                    changes.append({"op": "delete", "id": task_id})
+            else:
+                changes.append({"op": "insert" if first == "insert" else "update", "task": tasks[task_id]})
+        return changes
+
+    # ===== ФОНОВЫЙ ЦИКЛ =====
+
+    async def _run(self) -> None:
+        # Журнал читается с текущей позиции; подписчики читают снимок только после неё
+        try:
+            self._last_seq = await asyncio.to_thread(self._max_seq)
+        except Exception as e:
+            # Ожидающие подписчики получат ошибку, следующий подписчик запустит цикл заново
+            logger.error("Task feed start failed: %s", e)
+            self._start_error = e
+            self._task = None
+            self._ready.set()
+            return
+        self._start_error = None
+        self._ready.set()
+
+        marker = None
+        while self._subscribers:
+            try:
+                current = await asyncio.to_thread(self.data_version.current)
+                if current != marker:
+                    marker = current
+                    changes = await asyncio.to_thread(self._read_changes)
+                    if changes:
+                        self._broadcast({"changes": changes})
+            except Exception as e:
+                logger.error("Task feed poll failed: %s", e)
+            await asyncio.sleep(self.poll_interval)
+        self._task = None
+
+    def _broadcast(self, delta: dict) -> None:
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait(delta)
+            except asyncio.QueueFull:
+                # Отстающий клиент отключается; EventSource переподключится и получит снимок
+                self._subscribers.discard(subscriber)
+                while not subscriber.empty():
+                    subscriber.get_nowait()
+                subscriber.put_nowait(None)
+
+    # ===== ПОДПИСКА =====
+
+    async def stream(self) -> AsyncIterator[str]:
+        """
+        Генератор событий SSE для одного клиента.
+
+        Сначала отдаёт событие `snapshot` со всеми задачами, затем события `delta`
+        с изменениями и комментарии keep-alive во время простоя.
+        """
+        subscriber: asyncio.Queue = asyncio.Queue(maxsize=self.subscriber_queue_size)
+        # Подписываемся до чтения снимка: изменения между ними придут повторно,
+        # а применение insert/update/delete на клиенте идемпотентно
+        self._subscribers.add(subscriber)
+        if self._task is None:
+            self._ready = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+        try:
+            await self._ready.wait()
+            if self._start_error is not None:
+                raise self._start_error
+            snapshot = await asyncio.to_thread(self._read_snapshot)
+            yield format_sse("snapshot", snapshot)
+
+            while True:
+                try:
+                    delta = await asyncio.wait_for(subscriber.get(), timeout=self.keepalive_interval)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if delta is None:
+                    break
+                yield format_sse("delta", delta)
+        finally:
+            self._subscribers.discard(subscriber)
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Форматирует событие Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
@@ -4,6 +4,8 @@ import logging
 from functools import wraps
 from typing import Callable, Any
 
+from metrics import RETRIES
+
 logger = logging.getLogger(__name__)
 
 
@@ -21,7 +23,8 @@ def retry_on_failure(max_retries: int = 2, delay: float = 1.0) -> Callable:
                 except Exception as e:
                     last_exception = e
                     if attempt < max_retries - 1:
-                        logger.warning(f"Попытка {attempt + 1} неудачна ({func.__name__}): {e}. Повтор через {delay}s")
+                        RETRIES.inc(function=func.__qualname__)
+                        logger.warning("Попытка %s неудачна (%s): %s. Повтор через %ss", attempt + 1, func.__name__, e, delay)
                         await asyncio.sleep(delay)
             # если все попытки не удались — пробрасываем последнюю ошибку
             raise last_exception
@@ -0,0 +1,65 @@
+# test_mcp_server.py
+"""
+Проверки инструментов MCP-сервера на временной базе.
+
+Запуск:
+    python -m unittest test_mcp_server
+"""
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from datetime import date, timedelta
+
+import mcp_server
+from db_pool import SQLitePool
+from setup import setup_database
+
+
+class EditDueDateTest(unittest.TestCase):
+    """Новый срок в edit_task/edit_tasks разбирается так же, как в add_task."""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self._tmp.name, "tasks.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_database(db_path)
+        self._saved_pool = mcp_server.pool
+        mcp_server.pool = SQLitePool(db_path)
+        self.ids = [mcp_server.add_task(title=f"Task {i}")["data"]["id"] for i in range(2)]
+
+    def tearDown(self):
+        mcp_server.pool.close()
+        mcp_server.pool = self._saved_pool
+        self._tmp.cleanup()
+
+    def _due_dates(self) -> list:
+        with mcp_server.pool.reader() as conn:
+            return [row[0] for row in conn.execute("SELECT due_date FROM tasks ORDER BY id")]
+
+    def test_edit_tasks_stores_iso_date(self):
+        result = mcp_server.edit_tasks(filter_ids=self.ids, due_date="завтра")
+        self.assertEqual(result["status"], "success", result)
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        self.assertEqual(self._due_dates(), [tomorrow, tomorrow])
+
+    def test_edit_task_stores_iso_date(self):
+        result = mcp_server.edit_task(task_id=self.ids[0], due_date="завтра")
+        self.assertEqual(result["status"], "success", result)
+        self.assertEqual(self._due_dates()[0], (date.today() + timedelta(days=1)).isoformat())
+
+    def test_unrecognized_due_date_is_rejected(self):
+        self.assertEqual(mcp_server.edit_tasks(filter_ids=self.ids, due_date="абракадабра")["status"], "error")
+        self.assertEqual(mcp_server.edit_task(task_id=self.ids[0], due_date="абракадабра")["status"], "error")
+        self.assertEqual(self._due_dates(), [None, None])
+
+    def test_empty_due_date_clears_date(self):
+        mcp_server.edit_tasks(filter_ids=self.ids, due_date="завтра")
+        result = mcp_server.edit_tasks(filter_ids=self.ids, due_date="")
+        self.assertEqual(result["status"], "success", result)
+        self.assertEqual(self._due_dates(), [None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
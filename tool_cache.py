@@ -0,0 +1,138 @@
+# tool_cache.py
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from metrics import TOOL_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Инструменты, которые только читают задачи
+READ_TOOLS = frozenset({"list_tasks", "search_tasks"})
+# Инструменты, после любого вызова которых кэш сбрасывается
+WRITE_TOOLS = frozenset({"add_task", "add_tasks", "edit_task", "edit_tasks", "delete_task"})
+
+
+def _result_text(result: Any) -> str:
+    """Текст результата: строка (embedded) или список блоков контента (MCP-адаптер)."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, list):
+        return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in result)
+    return str(result)
+
+
+def _is_error(result: Any) -> bool:
+    """Признак ответа инструмента {"status": "error", ...} или ошибки вызова."""
+    text = _result_text(result)
+    if text.startswith("Error executing tool"):
+        return True
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get("status") == "error"
+
+
+class ToolResultCache:
+    """
+    Кэш результатов читающих инструментов на стороне клиента.
+
+    Ключ — имя инструмента и аргументы. Любой вызов изменяющего инструмента
+    сбрасывает кэш целиком, даже завершившийся ошибкой или таймаутом (изменение
+    могло успеть записаться); записи также живут не дольше `ttl` секунд
+    (на случай изменений из других процессов). Результат чтения, начатого до
+    изменения и закончившегося после него, в кэш не попадает.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(name: str, arguments: dict) -> tuple[str, str]:
+        return name, json.dumps(arguments, sort_keys=True, ensure_ascii=False, default=str)
+
+    def invalidate(self) -> None:
+        """Сбрасывает все сохранённые результаты."""
+        self._entries.clear()
+        self._generation += 1
+        self.invalidations += 1
+
+    async def _call_read(self, tool: BaseTool, arguments: dict) -> Any:
+        key = self._key(tool.name, arguments)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            TOOL_CACHE_REQUESTS.inc(tool=tool.name, result="hit")
+            return entry[1]
+
+        self.misses += 1
+        TOOL_CACHE_REQUESTS.inc(tool=tool.name, result="miss")
+        generation = self._generation
+        result = await self._invoke(tool, arguments)
+
+        if generation == self._generation and not _is_error(result):
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    async def _call_write(self, tool: BaseTool, arguments: dict) -> Any:
+        try:
+            return await self._invoke(tool, arguments)
+        finally:
+            self.invalidate()
+
+    @staticmethod
+    async def _invoke(tool: BaseTool, arguments: dict) -> Any:
+        # Колбэки срабатывают на внешнем инструменте-обёртке; внутренний вызов
+        # их не наследует, иначе метрики и события стрима учитывались бы дважды
+        return await tool.ainvoke(arguments, config={"callbacks": []})
+
+    def wrap(self, tools: list[BaseTool]) -> list[BaseTool]:
+        """Возвращает инструменты с той же схемой, читающие через кэш."""
+        wrapped = []
+        for tool in tools:
+            if tool.name in READ_TOOLS:
+                call = self._call_read
+            elif tool.name in WRITE_TOOLS:
+                call = self._call_write
+            else:
+                wrapped.append(tool)
+                continue
+            wrapped.append(self._wrap_tool(tool, call))
+        return wrapped
+
+    @staticmethod
+    def _wrap_tool(tool: BaseTool, call) -> BaseTool:
+        async def coroutine(**kwargs) -> Any:
+            return await call(tool, kwargs)
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=coroutine,
+            handle_tool_error=True,
+        )
+
+    def stats(self) -> dict:
+        """Счётчики попаданий и промахов."""
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }